@@ -9,7 +9,7 @@ module fnn_common
     implicit none
 
     private
-    public :: rk, ik, rand1d, rand2d
+    public :: rk, ik, rand1d, rand2d, read_integer, read_real, read_reals, read_string
 
     !> The precision for real numbers.
     integer, parameter :: rk = real64
@@ -37,5 +37,86 @@ contains
         call random_number(x)
     end subroutine rand2d
 
+    !> @brief Returns whether a unit is connected for unformatted access.
+    !> @details Model files are either formatted (txt files) or unformatted
+    !> with stream access (binary files, in which integers are int32 and
+    !> real numbers are float64).
+    !> @param[in] unit_num The unit number.
+    !> @return Whether the unit is unformatted.
+    logical function is_unformatted(unit_num)
+        integer(ik), intent(in) :: unit_num
+        character(len=20) :: form
+        inquire(unit=unit_num, form=form)
+        is_unformatted = ( trim(form) == 'UNFORMATTED' )
+    end function is_unformatted
+
+    !> @brief Reads an integer from a model file.
+    !> @param[in] unit_num The unit number for the read statement.
+    !> @param[out] value The integer.
+    subroutine read_integer(unit_num, value)
+        integer(ik), intent(in) :: unit_num
+        integer(ik), intent(out) :: value
+        integer(int32) :: raw
+        if ( is_unformatted(unit_num) ) then
+            read(unit_num) raw
+            value = raw
+        else
+            read(unit_num, *) value
+        end if
+    end subroutine read_integer
+
+    !> @brief Reads a real number from a model file.
+    !> @param[in] unit_num The unit number for the read statement.
+    !> @param[out] value The real number.
+    subroutine read_real(unit_num, value)
+        integer(ik), intent(in) :: unit_num
+        real(rk), intent(out) :: value
+        real(real64) :: raw
+        if ( is_unformatted(unit_num) ) then
+            read(unit_num) raw
+            value = raw
+        else
+            read(unit_num, *) value
+        end if
+    end subroutine read_real
+
+    !> @brief Reads a 1d table of real numbers from a model file.
+    !> @details In binary files, the table is read in place, since
+    !> the precision rk is that of the file (float64).
+    !> @param[in] unit_num The unit number for the read statement.
+    !> @param[out] values The 1d table of real numbers to fill.
+    subroutine read_reals(unit_num, values)
+        integer(ik), intent(in) :: unit_num
+        real(rk), intent(out) :: values(:)
+        if ( is_unformatted(unit_num) ) then
+            read(unit_num) values
+        else
+            read(unit_num, *) values
+        end if
+    end subroutine read_reals
+
+    !> @brief Reads a string from a model file.
+    !> @details In binary files, the string is preceded by its length, which
+    !> must not exceed the length of string (the program stops otherwise).
+    !> @param[in] unit_num The unit number for the read statement.
+    !> @param[out] string The string.
+    subroutine read_string(unit_num, string)
+        integer(ik), intent(in) :: unit_num
+        character(len=*), intent(out) :: string
+        integer(int32) :: length
+        if ( is_unformatted(unit_num) ) then
+            read(unit_num) length
+            ! a truncated or malformed file must not write past the string
+            if ( length < 0 .or. length > len(string) ) then
+                print *, 'ERROR: invalid string length in binary model file (', length, ')'
+                error stop
+            end if
+            string = ''
+            read(unit_num) string(1:length)
+        else
+            read(unit_num, *) string
+        end if
+    end subroutine read_string
+
 end module fnn_common
 
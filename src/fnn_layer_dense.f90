@@ -105,13 +105,13 @@ contains
         integer(ik), intent(in) :: batch_size
         integer(ik), intent(in) :: unit_num
         character(len=100) :: activation_name
-        read(unit_num, *) self % input_size
-        read(unit_num, *) self % output_size
+        call read_integer(unit_num, self % input_size)
+        call read_integer(unit_num, self % output_size)
         self % batch_size = batch_size
         self % num_parameters = (self % input_size+1) * self % output_size
         allocate(self % parameters(self % num_parameters))
-        read(unit_num, *) self % parameters
-        read(unit_num, *) activation_name
+        call read_reals(unit_num, self % parameters)
+        call read_string(unit_num, activation_name)
         select case(trim(activation_name))
             case('tanh')
                 allocate(TanhActivation::self % activation)
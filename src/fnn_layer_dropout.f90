@@ -48,8 +48,8 @@ contains
     type(DropoutLayer) function dropout_layer_fromfile(batch_size, unit_num) result (self)
         integer(ik), intent(in) :: batch_size
         integer(ik), intent(in) :: unit_num
-        read(unit_num, *) self % input_size
-        read(unit_num, *) self % rate
+        call read_integer(unit_num, self % input_size)
+        call read_real(unit_num, self % rate)
         self % output_size = self % input_size
         self % batch_size = batch_size
         self % num_parameters = 0
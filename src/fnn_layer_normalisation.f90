@@ -49,11 +49,11 @@ contains
     type(NormalisationLayer) function norm_layer_fromfile(batch_size, unit_num) result (self)
         integer(ik), intent(in) :: batch_size
         integer(ik), intent(in) :: unit_num
-        read(unit_num, *) self % input_size
+        call read_integer(unit_num, self % input_size)
         allocate(self % alpha(self % input_size))
         allocate(self % beta(self % input_size))
-        read(unit_num, *) self % alpha
-        read(unit_num, *) self % beta
+        call read_reals(unit_num, self % alpha)
+        call read_reals(unit_num, self % beta)
         self % output_size = self % input_size
         self % batch_size = batch_size
         self % num_parameters = 0
@@ -11,7 +11,7 @@ module fnn_network_sequential
     implicit none
 
     private
-    public :: SequentialNeuralNetwork, construct_sequential_neural_network, snn_fromfile
+    public :: SequentialNeuralNetwork, construct_sequential_neural_network, snn_fromfile, snn_fromfile_bin
 
     !--------------------------------------------------
     !> @brief Layer container class.
@@ -118,20 +118,49 @@ contains
         integer(ik), intent(in) :: batch_size
         character(len=*), intent(in) :: filename
         integer(ik) :: fileunit
+        open(newunit=fileunit, file=filename, action='read')
+        self = snn_fromunit(batch_size, fileunit)
+        close(fileunit)
+    end function snn_fromfile
+
+    !--------------------------------------------------
+    !> @brief Constructor for class \ref sequentialneuralnetwork from a binary file.
+    !> @details The binary file has the same content as the txt file,
+    !> in little-endian binary form (see `keras_to_bin` in `keras_to_fnn.py`):
+    !> reading it does not require any conversion between text and real numbers.
+    !> @param[in] batch_size The value for layer::batch_size.
+    !> @param[in] filename The name of the file to read.
+    !> @return The constructed network.
+    type(SequentialNeuralNetwork) function snn_fromfile_bin(batch_size, filename) result(self)
+        integer(ik), intent(in) :: batch_size
+        character(len=*), intent(in) :: filename
+        integer(ik) :: fileunit
+        open(newunit=fileunit, file=filename, action='read', form='unformatted', access='stream')
+        self = snn_fromunit(batch_size, fileunit)
+        close(fileunit)
+    end function snn_fromfile_bin
+
+    !--------------------------------------------------
+    !> @brief Constructor for class \ref sequentialneuralnetwork from an open file.
+    !> @param[in] batch_size The value for layer::batch_size.
+    !> @param[in] fileunit The unit number for the read statements.
+    !> @return The constructed network.
+    type(SequentialNeuralNetwork) function snn_fromunit(batch_size, fileunit) result(self)
+        integer(ik), intent(in) :: batch_size
+        integer(ik), intent(in) :: fileunit
         character(len=100) :: network_name
         character(len=100) :: layer_name
         integer(ik) :: i
         integer(ik) :: ip
-        open(newunit=fileunit, file=filename, action='read')
-        read(fileunit, fmt=*) network_name
+        call read_string(fileunit, network_name)
         if ( trim(network_name) == 'sequential' ) then
-            read(fileunit, fmt=*) self % num_layers
+            call read_integer(fileunit, self % num_layers)
             allocate(self % list_layers(self % num_layers))
             allocate(self % ip_start(self % num_layers))
             allocate(self % ip_end(self % num_layers))
             ip = 0
             do i = 1, self % num_layers
-                read(fileunit, fmt=*) layer_name
+                call read_string(fileunit, layer_name)
                 select case(trim(layer_name))
                     case('normalisation')
                         allocate(NormalisationLayer::self % list_layers(i) % this_layer)
@@ -155,8 +184,7 @@ contains
         else
             print *, 'ERROR: unknown network name (', trim(network_name), ')'
         end if
-        close(fileunit)
-    end function snn_fromfile
+    end function snn_fromunit
 
     !--------------------------------------------------
     !> @brief Implements \ref sequentialneuralnetwork::get_input_size.
@@ -17,6 +17,11 @@ model into a .txt file:
 
     >>> keras_to_txt('model_out.txt', keras_model)
 
+Use the \ref keras_to_bin function as follows to convert a keras
+model into a binary file:
+
+    >>> keras_to_bin('model_out.bin', keras_model)
+
 Command-line usage
 ------------------
 
@@ -26,6 +31,10 @@ Use the following command to convert a `.h5` file into a `.txt` file:
 """
 
 import argparse
+import functools
+import hashlib
+import os
+import struct
 import numpy as np
 
 ## Format function for strings.
@@ -34,6 +43,14 @@ STR_FORMAT = '{}'.format
 INT_FORMAT = '{:>7d}'.format
 ## Format function for real numbers.
 FLOAT_FORMAT = '{:0.7e}'.format
+## Format string for arrays of real numbers (applied by numpy.savetxt).
+FLOAT_ARRAY_FORMAT = '%0.7e'
+## Binary format for integers.
+INT_BIN_FORMAT = '<i'
+## Binary format for real numbers.
+FLOAT_BIN_FORMAT = '<d'
+## Binary dtype for arrays of real numbers.
+FLOAT_BIN_DTYPE = '<f8'
 
 
 class UnsupportedModelException(Exception):
@@ -45,17 +62,48 @@ class UnsupportedLayerException(Exception):
 
 
 ##\cond
-def get_model_name(_model, config, **_kwargs):
+@functools.lru_cache(maxsize=None)
+def get_tensorflow():
+    """Returns the tensorflow module, imported on first use only."""
+    import tensorflow as tf  # pylint: disable=import-outside-toplevel
+    return tf
+
+
+def load_model(filename_in, **kwargs):
+    """Returns the keras model read from a file, cached by file content."""
+    # the metadata are not enough: a file rewritten in place (e.g. by the tests)
+    # can keep its size and, on some filesystems, its modification time
+    digest = hashlib.sha256()
+    with open(filename_in, 'rb') as file_in:
+        for block in iter(functools.partial(file_in.read, 1 << 20), b''):
+            digest.update(block)
+    custom_objects = tuple(kwargs['custom_objects']) if kwargs.get('custom_objects') else ()
+    return load_model_cached(os.path.abspath(filename_in), digest.hexdigest(), custom_objects)
+
+
+@functools.lru_cache(maxsize=4)
+def load_model_cached(filename_in, _digest, custom_objects):
+    """Reads a keras model file (the digest is only used as cache key)."""
+    tf = get_tensorflow()
+    custom_objects = {key: lambda x,y: 0 for key in custom_objects}
+    return tf.keras.models.load_model(filename_in, custom_objects=custom_objects)
+
+
+def get_model_name(model, **_kwargs):
     """Returns the model name for a given model."""
-    return config['name']
+    return model.name
 
 
-def get_num_layers(model, config, **kwargs):
+def get_layer_meta(model, **kwargs):
+    """Returns the (name, layer, dropout rate) of each layer for a given model."""
+    return [(get_layer_name(layer, **kwargs), layer, dropout_rate)
+            for (layer, dropout_rate) in zip(model.layers, kwargs['dropout_rates'])]
+
+
+def get_num_layers(layer_meta, **kwargs):
     """Returns the total number of layers for a given model."""
     num_layers = 0
-    for (layer, dropout_rate, subconfig) in zip(model.layers,
-            kwargs['dropout_rates'], config['layers'][1:]):
-        layer_name = get_layer_name(layer, subconfig, **kwargs)
+    for (layer_name, _layer, dropout_rate) in layer_meta:
         if layer_name == 'Dense':
             num_layers += 1
             if dropout_rate is not None:
@@ -72,78 +120,183 @@ def get_num_layers(model, config, **kwargs):
     return num_layers
 
 
-def get_input_shape(_model, config, **_kwargs):
+def get_input_shape(model, **_kwargs):
     """Returns the input shape for a given model."""
-    return config['layers'][0]['config']['batch_input_shape']
+    return model.input_shape
 
 
-def get_dropout_rates(model, _config, **kwargs):
+def get_dropout_rates(model, **kwargs):
     """Returns the dropout rates for each layer."""
     num_layers = len(model.layers)
     rates = kwargs.get('dropout_rates', None)
     if isinstance(rates, int):
-        return [rates for _ in range(num_layers)]
+        return [rates] * num_layers
     if isinstance(rates, list):
         if len(rates) > num_layers:
             raise ValueError('too many dropout rates are provided')
-        while len(rates) < num_layers:
-            rates.append(None)
-        return rates
-    return [None for _ in range(num_layers)]
+        return rates + [None] * (num_layers - len(rates))
+    return [None] * num_layers
 
 
-def get_layer_name(_layer, subconfig, **_kwargs):
+def get_layer_name(layer, **_kwargs):
     """Returns the layer name for a given layer."""
-    return subconfig['class_name']
+    return type(layer).__name__
 
 
-def get_activation_name(_layer, subconfig, **_kwargs):
+def get_activation_name(layer, **_kwargs):
     """Returns the activation name for a given layer."""
-    return subconfig['config']['activation']
+    return layer.activation.__name__
 
-def get_rate(_layer, subconfig, **_kwargs):
+def get_rate(layer, **_kwargs):
     """Returns the rate for a given layer."""
-    return subconfig['config']['rate']
-
-def add_normalisation_layer(write, input_shape, for_input, **kwargs):
+    return layer.rate
+
+def quantise(array, **kwargs):
+    """Returns the array rounded to the requested precision, if any."""
+    precision = kwargs.get('precision', None)
+    if precision is None:
+        return array
+    if precision == 'f32':
+        return np.asarray(array, dtype=np.float32)
+    if precision == 'bf16':
+        # keep the 16 most significant bits of the float32 representation,
+        # with round-to-nearest-even
+        values = np.asarray(array, dtype=np.float32)
+        bits = values.view(np.uint32)
+        bits = (bits + (0x7FFF + ((bits >> 16) & 1))) & 0xFFFF0000
+        # the rounding would turn a nan into an infinity (or wrap it around to zero)
+        return np.where(np.isnan(values), values, bits.view(np.float32))
+    raise ValueError(f'unsupported precision: {precision}')
+
+class TxtWriter:
+    """Writes the content of a txt model file."""
+
+    def __init__(self, file_out):
+        self.file_out = file_out
+
+    def string(self, value):
+        """Adds a string."""
+        self.file_out.write(STR_FORMAT(value) + '\n')
+
+    def integer(self, value):
+        """Adds an integer."""
+        self.file_out.write(INT_FORMAT(value) + '\n')
+
+    def real(self, value):
+        """Adds a real number."""
+        self.file_out.write(FLOAT_FORMAT(value) + '\n')
+
+    def reals(self, *arrays):
+        """Adds the content of arrays of real numbers, as a single line."""
+        # numpy.savetxt formats each array in a single call, without copying it,
+        # the arrays are separated by tabs and the line ends after the last one
+        arrays = [array for array in arrays if np.size(array) > 0]
+        for (i, array) in enumerate(arrays):
+            newline = '\n' if i == len(arrays)-1 else '\t'
+            np.savetxt(self.file_out, np.reshape(array, (1, -1)), fmt=FLOAT_ARRAY_FORMAT,
+                       delimiter='\t', newline=newline)
+        if not arrays:
+            self.file_out.write('\n')
+
+
+class BinWriter:
+    """Writes the content of a binary model file."""
+
+    def __init__(self, file_out):
+        # the (small) strings and numbers are gathered in a buffer,
+        # which is only written to file before the (large) arrays
+        self.file_out = file_out
+        self.buffer = bytearray()
+
+    def string(self, value):
+        """Adds a string, preceded by its length."""
+        data = value.encode('ascii')
+        self.buffer += struct.pack(INT_BIN_FORMAT, len(data))
+        self.buffer += data
+
+    def integer(self, value):
+        """Adds an integer."""
+        self.buffer += struct.pack(INT_BIN_FORMAT, value)
+
+    def real(self, value):
+        """Adds a real number."""
+        self.buffer += struct.pack(FLOAT_BIN_FORMAT, value)
+
+    def reals(self, *arrays):
+        """Writes the content of arrays of real numbers."""
+        self.flush()
+        for array in arrays:
+            np.ascontiguousarray(array, dtype=FLOAT_BIN_DTYPE).tofile(self.file_out)
+
+    def flush(self):
+        """Writes the buffer to file."""
+        if self.buffer:
+            self.file_out.write(self.buffer)
+            self.buffer = bytearray()
+
+
+def add_normalisation_layer(writer, input_shape, for_input, **kwargs):
     """Adds content for a normalisation layer."""
     lbl = 'in' if for_input else 'out'
     key = f'add_norm_{lbl}'
     if key in kwargs and kwargs[key]:
         alpha = kwargs.get(f'norm_alpha_{lbl}', 1)
         beta = kwargs.get(f'norm_beta_{lbl}', 0)
-        write(STR_FORMAT('normalisation'))
-        write(INT_FORMAT(input_shape[1]))
-        write('\t'.join(FLOAT_FORMAT(a) for a in alpha))
-        write('\t'.join(FLOAT_FORMAT(b) for b in beta))
+        writer.string('normalisation')
+        writer.integer(input_shape[1])
+        writer.reals(alpha)
+        writer.reals(beta)
 
 
-def add_layer(write, input_shape, layer, subconfig, dropout_rate, **kwargs):
+def add_layer(writer, input_shape, layer_meta, **kwargs):
     """Adds content for a layer."""
-    layer_name = get_layer_name(layer, subconfig, **kwargs)
+    (layer_name, layer, dropout_rate) = layer_meta
     if layer_name == 'Dense':
         output_shape = layer.compute_output_shape(input_shape)
-        kernel = layer.weights[0].numpy().flatten()
-        bias = layer.weights[1].numpy()
-        parameters = np.concatenate([bias, kernel])
-        write(STR_FORMAT('dense'))
-        write(INT_FORMAT(input_shape[1]))
-        write(INT_FORMAT(output_shape[1]))
-        write('\t'.join(FLOAT_FORMAT(num) for num in parameters))
-        write(STR_FORMAT(get_activation_name(layer, subconfig, **kwargs)))
+        # both arrays are fetched from keras in a single call
+        (kernel, bias) = layer.get_weights()
+        kernel = quantise(kernel.ravel(), **kwargs)
+        bias = quantise(bias, **kwargs)
+        writer.string('dense')
+        writer.integer(input_shape[1])
+        writer.integer(output_shape[1])
+        # bias then kernel
+        writer.reals(bias, kernel)
+        writer.string(get_activation_name(layer, **kwargs))
         if dropout_rate is not None:
-            write(STR_FORMAT('dropout'))
-            write(INT_FORMAT(output_shape[1]))
-            write(FLOAT_FORMAT(dropout_rate))
+            writer.string('dropout')
+            writer.integer(output_shape[1])
+            writer.real(dropout_rate)
         return output_shape
     elif layer_name == 'Dropout':
         output_shape = layer.compute_output_shape(input_shape)
         if not 'ignore_dropout' in kwargs or not kwargs['ignore_dropout']:
-            write(STR_FORMAT('dropout'))
-            write(INT_FORMAT(output_shape[1]))
-            write(FLOAT_FORMAT(get_rate(layer, subconfig, **kwargs)))
+            writer.string('dropout')
+            writer.integer(output_shape[1])
+            writer.real(get_rate(layer, **kwargs))
         return output_shape
     raise UnsupportedLayerException(layer_name)
+
+
+def add_model(writer, model, **kwargs):
+    """Adds content for a model."""
+    # the model and layers are described by their attributes rather than
+    # by model.get_config(), which serialises the whole model
+    model_name = get_model_name(model, **kwargs)
+    if 'sequential' in model_name:
+        input_shape = get_input_shape(model, **kwargs)
+        dropout_rates = get_dropout_rates(model, **kwargs)
+        kwargs['dropout_rates'] = dropout_rates
+        layer_meta = get_layer_meta(model, **kwargs)
+        num_layers = get_num_layers(layer_meta, **kwargs)
+        writer.string('sequential')
+        writer.integer(num_layers)
+        add_normalisation_layer(writer, input_shape, True, **kwargs)
+        for meta in layer_meta:
+            input_shape = add_layer(writer, input_shape, meta, **kwargs)
+        add_normalisation_layer(writer, input_shape, False, **kwargs)
+    else:
+        raise UnsupportedModelException(model_name)
 ##\endcond
 
 
@@ -167,32 +320,44 @@ def keras_to_txt(filename_out, model, **kwargs):
         - Whether to add dropout after each internal layer, with the given rate.
     - [in] `ignore_dropout` : bool
         - Whether to ignore the keras Dropout layers.
+    - [in] `precision` : None or str
+        - Precision (`'f32'` or `'bf16'`) to which the parameters of the dense
+        layers are rounded before being written. The values are only rounded:
+        they are still written with the usual format (7 significant digits in
+        txt files, float64 in binary files), hence the files are neither
+        smaller nor faster to write. By default, they are written with the
+        precision of the keras model.
     @param[in] filename_out The name of the txt file to write.
     @param[in] model The keras model.
     @param[in] kwargs Key-word arguments.
     """
     with open(filename_out, 'w') as file_out:
+        add_model(TxtWriter(file_out), model, **kwargs)
+
+
+def keras_to_bin(filename_out, model, **kwargs):
+    """! @brief Transforms a keras model into a binary model file.
+
+    @details The binary file has the same content as the txt file written
+    by \ref keras_to_txt, in little-endian binary form: strings are written
+    as their length (int32) followed by their ascii characters, integers as
+    int32 and real numbers as float64. Writing and reading such a file
+    does not require any conversion between text and real numbers.
+
+    \b Note
+
+    This format is read by FNN with `snn_fromfile_bin`, and by the
+    python toolkit used in the test suite.
 
-        def write(line):
-            file_out.write(line + '\n')
-
-        config = model.get_config()
-        model_name = get_model_name(model, config, **kwargs)
-        if 'sequential' in model_name:
-            input_shape = get_input_shape(model, config, **kwargs)
-            dropout_rates = get_dropout_rates(model, config, **kwargs)
-            kwargs['dropout_rates'] = dropout_rates
-            num_layers = get_num_layers(model, config, **kwargs)
-            write(STR_FORMAT('sequential'))
-            write(INT_FORMAT(num_layers))
-            add_normalisation_layer(write, input_shape, True, **kwargs)
-            for (layer, dropout_rate, subconfig) in zip(model.layers, 
-                    dropout_rates, config['layers'][1:]):
-                input_shape = add_layer(write, input_shape, layer, subconfig,
-                                        dropout_rate, **kwargs)
-            add_normalisation_layer(write, input_shape, False, **kwargs)
-        else:
-            raise UnsupportedModelException(model_name)
+    This function accepts the same kwargs as \ref keras_to_txt.
+    @param[in] filename_out The name of the binary file to write.
+    @param[in] model The keras model.
+    @param[in] kwargs Key-word arguments.
+    """
+    with open(filename_out, 'wb') as file_out:
+        writer = BinWriter(file_out)
+        add_model(writer, model, **kwargs)
+        writer.flush()
 
 
 def keras_file_to_txt(filename_out, filename_in, **kwargs):
@@ -204,7 +369,8 @@ def keras_file_to_txt(filename_out, filename_in, **kwargs):
     \b Note
 
     This function uses `tf.keras.models.load_model` to read
-    `filename_in`.
+    `filename_in`. The model is cached, hence converting several
+    times the same file only reads it once with keras.
 
     \b Accepted \b kwargs
     - [in] `custom_objects` : list of str
@@ -226,12 +392,7 @@ def keras_file_to_txt(filename_out, filename_in, **kwargs):
     - [in] `norm_alpha_out` : np.ndarray
         - Value of `alpha` (1d array) for the output normalisation layer, if any.
     """
-    import tensorflow as tf  # pylint: disable=import-outside-toplevel
-    custom_objects = {
-            key: lambda x,y: 0
-            for key in kwargs['custom_objects']
-            } if 'custom_objects' in kwargs and kwargs['custom_objects'] else {}
-    model = tf.keras.models.load_model(filename_in, custom_objects=custom_objects)
+    model = load_model(filename_in, **kwargs)
     if 'custom_objects' in kwargs:
         del kwargs['custom_objects']
     keras_to_txt(filename_out, model, **kwargs)
@@ -245,6 +406,10 @@ if __name__ == '__main__':
     parser.add_argument('keras_file', help='input keras file')
     parser.add_argument('-c', '--custom', nargs='*', help='list custom keras object to ignore')
     parser.add_argument('-i', '--ignore', action='store_true', help='whether to ignore dropout layers')
+    parser.add_argument('-p', '--precision', choices=['f32', 'bf16'],
+                        help='precision to which the dense layer parameters are rounded '
+                        '(the values are still written with the usual format)')
     args = parser.parse_args()
-    keras_file_to_txt(args.txt_file, args.keras_file, custom_objects=args.custom, ignore_dropout=args.ignore)
+    keras_file_to_txt(args.txt_file, args.keras_file, custom_objects=args.custom, ignore_dropout=args.ignore,
+                      precision=args.precision)
 ##\endcond
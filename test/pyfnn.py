@@ -1,103 +1,202 @@
 #!/usr/bin/env python
 
-from abc import ABC, abstractmethod
 import numpy as np
 
+# numba is optional, it is only used to speed up the forward
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = prange = None
+
+# scipy is optional, it is only used for the rank-1 update of the adjoint
+try:
+    from scipy.linalg.blas import dger
+except ImportError:
+    dger = None
+
 #--------------------------------------------------
 # activation functions
 #--------------------------------------------------
 
 def construct_activation(name, **kwargs):
-    activation_class = dict(
-            linear=LinearActivation,
-            tanh=TanhActivation,
-            relu=ReluActivation,
-            )
-    return activation_class[name](**kwargs)
+    return AbstractActivation._registered_activations[name](**kwargs)
+
+# fused output and derivative in a single pass (z is overwritten by the output);
+# the scalar tanh of numba is slower than the vectorised one of numpy beyond
+# a few tens of values, hence it is only used for small layers
+FUSED_TANH_MAX_SIZE = 64
+
+if njit is not None:
+    @njit(fastmath=True, cache=True)
+    def _tanh_linearise(z, prime):
+        for i in range(z.size):
+            y = np.tanh(z[i])
+            z[i] = y
+            prime[i] = 1 - y*y
+
+    @njit(fastmath=True, cache=True)
+    def _relu_linearise(z, prime):
+        for i in range(z.size):
+            if z[i] > 0:
+                prime[i] = 1
+            else:
+                prime[i] = 0
+                z[i] = 0
+else:
+    _tanh_linearise = _relu_linearise = None
 
-class AbstractActivation(ABC):
+class AbstractActivation:
 
-    def __init__(self, **kwargs):
-        pass
+    # base class of the activations: the nonlinear ones store their derivative
+    # when linearised; the subclasses define apply and apply_linearise, and
+    # are registered under the name given in their definition
 
-    @abstractmethod
-    def apply(self, z):
-        pass
+    _registered_activations = {}
 
-    @abstractmethod
-    def apply_linearise(self, z):
-        pass
+    def __init_subclass__(cls, name=None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if name is not None:
+            AbstractActivation._registered_activations[name] = cls
+
+    def __init__(self, **kwargs):
+        self.activation_prime = None
+
+    def prime_buffer(self, shape):
+        # persistent buffer for the derivative, reallocated only when the shape changes
+        if self.activation_prime is None or self.activation_prime.shape != shape:
+            self.activation_prime = np.empty(shape)
+        return self.activation_prime
 
     def apply_tangent_linear(self, dz):
-        return self.activation_prime * dz
+        # dz is always a temporary of the layer, hence it is overwritten,
+        # unless it has to be broadcast to the shape of the linearisation
+        if dz.shape != self.activation_prime.shape:
+            return self.activation_prime * dz
+        return np.multiply(self.activation_prime, dz, out=dz)
 
     def apply_adjoint(self, dy):
         return self.activation_prime * dy
 
-class LinearActivation:
+class LinearActivation(AbstractActivation, name='linear'):
 
     def __init__(self, **kwargs):
-        pass
+        super(LinearActivation, self).__init__(**kwargs)
 
-    def apply(self, z):
-        return z
+    def apply(self, z, out=None):
+        if out is None or out is z:
+            return z
+        np.copyto(out, z)
+        return out
 
     def apply_linearise(self, z):
         return z
 
+    # the derivative is one: no need to store it nor to multiply by it
+
     def apply_tangent_linear(self, dz):
         return dz
 
     def apply_adjoint(self, dy):
         return dy
 
-class TanhActivation(AbstractActivation):
+class TanhActivation(AbstractActivation, name='tanh'):
 
     def __init__(self, **kwargs):
         super(TanhActivation, self).__init__(**kwargs)
 
-    def apply(self, z):
-        return np.tanh(z)
+    def apply(self, z, out=None):
+        return np.tanh(z, out=out)
 
     def apply_linearise(self, z):
-        y = np.tanh(z)
-        self.activation_prime = 1 - y**2
+        # z is overwritten by the output
+        prime = self.prime_buffer(z.shape)
+        if _tanh_linearise is not None and z.size <= FUSED_TANH_MAX_SIZE:
+            _tanh_linearise(z.reshape(-1), prime.reshape(-1))
+            return z
+        y = np.tanh(z, out=z)
+        np.multiply(y, y, out=prime)
+        np.subtract(1, prime, out=prime)
         return y
 
-class ReluActivation(AbstractActivation):
+class ReluActivation(AbstractActivation, name='relu'):
 
     def __init__(self, **kwargs):
         super(ReluActivation, self).__init__(**kwargs)
 
-    def apply(self, z):
-        return np.maximum(z, 0)
+    def apply(self, z, out=None):
+        return np.maximum(z, 0, out=out)
 
     def apply_linearise(self, z):
-        self.activation_prime = 1 * (z>0)
-        return np.maximum(z, 0)
+        # z is overwritten by the output
+        prime = self.prime_buffer(z.shape)
+        if _relu_linearise is not None:
+            _relu_linearise(z.reshape(-1), prime.reshape(-1))
+            return z
+        # both passes are in place, np.maximum is faster than multiplying z by prime
+        np.greater(z, 0, out=prime)
+        return np.maximum(z, 0, out=z)
 
 #--------------------------------------------------
 # layers
 #--------------------------------------------------
 
+def read_reals(f):
+    # parses one line of reals, much faster than np.loadtxt
+    return np.fromstring(f.readline(), sep=' ')
+
 def layer_fromfile(f):
     layer_name = f.readline().strip()
     if layer_name == 'dense':
         Nin = int(f.readline().strip())
         Nout = int(f.readline().strip())
-        p = np.loadtxt(f, max_rows=1)
+        p = read_reals(f)
         activation = f.readline().strip()
-        layer = DenseLayer(Nin, Nout, activation, initialisation='value', initialisation_kwargs=dict(value=p))
+        layer = DenseLayer(Nin, Nout, activation, initialisation='zero')
+        layer.initialise('value', value=layer.fortran_to_numpy_parameters(p))
         return layer
     elif layer_name == 'normalisation':
         Ninout = int(f.readline().strip())
-        alpha = np.loadtxt(f, max_rows=1)
-        beta = np.loadtxt(f, max_rows=1)
+        alpha = read_reals(f)
+        beta = read_reals(f)
         layer = NormalisationLayer(Ninout, alpha, beta)
         return layer
     elif layer_name == 'dropout':
         Ninout = int(f.readline().strip())
-        rate = np.loadtxt(f, max_rows=1)
+        rate = read_reals(f)[0]
+        layer = DropoutLayer(Ninout, rate)
+        return layer
+    else:
+        print('unknown layer type:', layer_name)
+
+def read_bin_int(f):
+    return int(np.fromfile(f, dtype='<i4', count=1)[0])
+
+def read_bin_string(f):
+    n = read_bin_int(f)
+    return f.read(n).decode('ascii')
+
+def read_bin_reals(f, n):
+    return np.fromfile(f, dtype='<f8', count=n)
+
+def layer_fromfile_bin(f):
+    layer_name = read_bin_string(f)
+    if layer_name == 'dense':
+        Nin = read_bin_int(f)
+        Nout = read_bin_int(f)
+        p = read_bin_reals(f, Nout*(Nin+1))
+        activation = read_bin_string(f)
+        layer = DenseLayer(Nin, Nout, activation, initialisation='zero')
+        layer.initialise('value', value=layer.fortran_to_numpy_parameters(p))
+        return layer
+    elif layer_name == 'normalisation':
+        Ninout = read_bin_int(f)
+        alpha = read_bin_reals(f, Ninout)
+        beta = read_bin_reals(f, Ninout)
+        layer = NormalisationLayer(Ninout, alpha, beta)
+        return layer
+    elif layer_name == 'dropout':
+        Ninout = read_bin_int(f)
+        rate = read_bin_reals(f, 1)[0]
         layer = DropoutLayer(Ninout, rate)
         return layer
     else:
@@ -112,6 +211,8 @@ def construct_layer(name, *args, **kwargs):
 
 class NormalisationLayer:
 
+    __slots__ = ('Nin', 'Nout', 'alpha', 'beta', 'num_parameters', 'parameters', 'keras_parameters')
+
     def __init__(self, Ninout, alpha, beta):
         self.Nin = Ninout
         self.Nout = Ninout
@@ -124,8 +225,19 @@ class NormalisationLayer:
     def initialise(self, *args, **kwargs):
         pass
 
-    def apply(self, x):
-        return self.alpha * x + self.beta
+    def fortran_to_numpy_parameters(self, p):
+        return p
+
+    def numpy_to_fortran_parameters(self, p):
+        return p
+
+    def astype(self, dtype):
+        return NormalisationLayer(self.Nin, self.alpha.astype(dtype), self.beta.astype(dtype))
+
+    def apply(self, x, out=None):
+        y = np.multiply(self.alpha, x, out=out)
+        y += self.beta
+        return y
 
     def apply_linearise(self, x):
         return self.apply(x)
@@ -144,6 +256,8 @@ class NormalisationLayer:
 
 class DropoutLayer:
 
+    __slots__ = ('Nin', 'Nout', 'rate', 'num_parameters', 'parameters', 'keras_parameters')
+
     def __init__(self, Ninout, rate):
         self.Nin = Ninout
         self.Nout = Ninout
@@ -155,8 +269,17 @@ class DropoutLayer:
     def initialise(self, *args, **kwargs):
         pass
 
-    def apply(self, x):
-        return x
+    def fortran_to_numpy_parameters(self, p):
+        return p
+
+    def numpy_to_fortran_parameters(self, p):
+        return p
+
+    def apply(self, x, out=None):
+        if out is None:
+            return x
+        np.copyto(out, x)
+        return out
 
     def apply_linearise(self, x):
         return self.apply(x)
@@ -173,15 +296,27 @@ class DropoutLayer:
     def apply_adjoint_p(self, dy):
         return np.zeros(0)
 
+if njit is not None:
+    @njit(fastmath=True, cache=True)
+    def _dense_forward(w, b, x, out):
+        for i in range(w.shape[0]):
+            s = b[i]
+            for j in range(w.shape[1]):
+                s += w[i, j] * x[j]
+            out[i] = s
+else:
+    _dense_forward = None
+
 class DenseLayer:
 
+    __slots__ = ('Nin', 'Nout', 'num_parameters', 'parameters', 'b', 'w', 'wT', 'activation', 'x')
+
     def __init__(self, Nin, Nout, activation='linear', activation_kwargs=None, initialisation='randn', initialisation_kwargs=None):
         self.Nin = Nin
         self.Nout = Nout
         self.num_parameters = self.Nout * (self.Nin+1)
-        self.parameters = np.empty(self.num_parameters)
-        self.b = self.parameters[:self.Nout]
-        self.w = self.parameters[self.Nout:].reshape((self.Nout, self.Nin), order='F')
+        self.bind(np.empty(self.num_parameters))
+        self.x = None
 
         initialisation_kwargs = initialisation_kwargs or {}
         self.initialise(initialisation, **initialisation_kwargs)
@@ -189,55 +324,245 @@ class DenseLayer:
         activation_kwargs = activation_kwargs or {}
         self.activation = construct_activation(activation, **activation_kwargs)
 
+    def bind(self, parameters):
+        # b, w and wT are views of the parameters
+        # (which can be a slice of the flat buffer of the network)
+        self.parameters = parameters
+        self.b = self.parameters[:self.Nout]
+        self.w = self.parameters[self.Nout:].reshape((self.Nout, self.Nin))
+        # x@wT is used instead of w@x to handle batches of shape (Ne, Nin)
+        self.wT = self.w.T
+
+    # the layout conversions below copy the parameters once, directly into the output
+
     @property
     def keras_parameters(self):
-        b_parameters = self.parameters[:self.Nout]
-        w_parameters = self.parameters[self.Nout:]
-        return np.concatenate([w_parameters, b_parameters])
-
-    def initialise(self, initialisation, **kwargs):
+        q = np.empty(self.num_parameters)
+        Nw = self.Nin * self.Nout
+        q[:Nw].reshape((self.Nin, self.Nout))[:] = self.wT
+        q[Nw:] = self.b
+        return q
+
+    def fortran_to_numpy_parameters(self, p):
+        # in fortran (and in txt files), w is stored in column-major order
+        q = np.empty(self.num_parameters)
+        q[:self.Nout] = p[:self.Nout]
+        q[self.Nout:].reshape((self.Nout, self.Nin))[:] = p[self.Nout:].reshape((self.Nout, self.Nin), order='F')
+        return q
+
+    def numpy_to_fortran_parameters(self, p):
+        q = np.empty(self.num_parameters)
+        q[:self.Nout] = p[:self.Nout]
+        q[self.Nout:].reshape((self.Nout, self.Nin), order='F')[:] = p[self.Nout:].reshape((self.Nout, self.Nin))
+        return q
+
+    def initialise(self, initialisation, rng=None, **kwargs):
+        # rng is an optional np.random.Generator, which draws directly into the parameters
         if initialisation == 'zero':
             self.parameters[:] = 0
         elif initialisation == 'randn':
-            self.parameters[:] = np.random.randn(self.num_parameters)
+            if rng is None:
+                self.parameters[:] = np.random.randn(self.num_parameters)
+            else:
+                rng.standard_normal(out=self.parameters)
         elif initialisation == 'value':
             self.parameters[:] = kwargs['value']
 
-    def apply(self, x):
-        z = self.w@x + self.b
-        return self.activation.apply(z)
+    def astype(self, dtype):
+        return dense_from_weights(self.w, self.b, self.activation, dtype=dtype)
+
+    def apply(self, x, out=None):
+        # the output is written in out (if given), the activation is applied in place
+        if out is None:
+            out = np.empty(x.shape[:-1]+(self.Nout,), dtype=self.w.dtype)
+        if _dense_forward is not None and x.ndim == 1:
+            _dense_forward(self.w, self.b, x, out)
+        else:
+            np.dot(x, self.wT, out=out)
+            out += self.b
+        return self.activation.apply(out, out=out)
 
     def apply_linearise(self, x):
-        self.x = x.copy()
-        z = self.w@x + self.b
+        # the input is kept in a persistent buffer, reallocated only when the shape changes
+        if self.x is None or self.x.shape != x.shape:
+            self.x = np.empty(x.shape)
+        np.copyto(self.x, x)
+        z = np.empty(x.shape[:-1]+(self.Nout,))
+        np.dot(x, self.wT, out=z)
+        z += self.b
         return self.activation.apply_linearise(z)
 
     def apply_tangent_linear_x(self, dx):
-        return self.activation.apply_tangent_linear(self.w@dx)
+        dz = np.empty(dx.shape[:-1]+(self.Nout,))
+        np.dot(dx, self.wT, out=dz)
+        return self.activation.apply_tangent_linear(dz)
 
-    def apply_adjoint_x(self, dy):
-        return self.w.T@self.activation.apply_adjoint(dy)
+    def apply_adjoint_x(self, dy, out=None):
+        # the output is written in out (if given), a batch of dy
+        # of shape (Ne, Nout) gives an output of shape (Ne, Nin)
+        return np.dot(self.activation.apply_adjoint(dy), self.w, out=out)
 
     def apply_tangent_linear_p(self, dp):
         db = dp[:self.Nout]
-        dw = dp[self.Nout:].reshape((self.Nout, self.Nin), order='F')
-        tlw = self.activation.apply_tangent_linear(dw@self.x)
-        tlb = self.activation.apply_tangent_linear(db)
-        return tlw + tlb
+        dw = dp[self.Nout:].reshape((self.Nout, self.Nin))
+        dz = np.empty(self.x.shape[:-1]+(self.Nout,))
+        np.dot(self.x, dw.T, out=dz)
+        dz += db
+        return self.activation.apply_tangent_linear(dz)
+
+    def apply_adjoint_p(self, dy, out=None):
+        # the output is written in out (if given), a batch of dy
+        # of shape (Ne, Nout) gives an output of shape (Ne, num_parameters)
+        if out is None:
+            out = np.empty(dy.shape[:-1]+(self.num_parameters,))
+        db = out[..., :self.Nout]
+        dw = out[..., self.Nout:].reshape(dy.shape[:-1]+(self.Nout, self.Nin))
+        db[...] = self.activation.apply_adjoint(dy)
+        if dy.ndim > 1:
+            np.multiply(db[..., :, None], self.x[..., None, :], out=dw)
+        elif dger is not None:
+            # the transpose of dw is in fortran order, hence it
+            # can be updated in place by the blas rank-1 update
+            dw.fill(0)
+            dger(1.0, self.x, db, a=dw.T, overwrite_a=True)
+        else:
+            np.multiply.outer(db, self.x, out=dw)
+        return out
 
-    def apply_adjoint_p(self, dy):
-        db = self.activation.apply_adjoint(dy)
-        dw = db.reshape((self.Nout, 1))@self.x.reshape((1, self.Nin))
-        return np.concatenate([db, dw.flatten(order='F')])
+def dense_from_weights(w, b, activation, dtype=np.float64):
+    layer = DenseLayer(w.shape[1], w.shape[0], initialisation='zero')
+    layer.bind(np.empty(layer.num_parameters, dtype=dtype))
+    layer.w[:] = w
+    layer.b[:] = b
+    layer.activation = activation
+    return layer
+
+class FusedDenseLayer:
+
+    # dense layer followed by a normalisation layer, forward only
+
+    __slots__ = ('Nin', 'Nout', 'dense', 'alpha', 'beta')
+
+    def __init__(self, dense, normalisation):
+        self.Nin = dense.Nin
+        self.Nout = dense.Nout
+        self.dense = dense
+        self.alpha = normalisation.alpha
+        self.beta = normalisation.beta
+
+    # the parameters are those of the dense layer, the normalisation is constant
+
+    @property
+    def num_parameters(self):
+        return self.dense.num_parameters
+
+    @property
+    def parameters(self):
+        return self.dense.parameters
+
+    def bind(self, parameters):
+        self.dense.bind(parameters)
+
+    def astype(self, dtype):
+        return FusedDenseLayer(self.dense.astype(dtype),
+                NormalisationLayer(self.Nout, self.alpha.astype(dtype), self.beta.astype(dtype)))
+
+    def apply(self, x, out=None):
+        # the output of the dense layer is never the input,
+        # hence it can be normalised in place
+        y = self.dense.apply(x, out=out)
+        np.multiply(y, self.alpha, out=y)
+        y += self.beta
+        return y
 
 #--------------------------------------------------
 # network
 #--------------------------------------------------
 
+# largest layer size for which the dense products are fully unrolled
+UNROLL_MAX_SIZE = 16
+
+def compile_forward(layers, dtype=np.float64, specialise=False):
+    # generates and jit-compiles a straight-line forward for the given layers;
+    # the parameters are passed as arguments (numba would freeze global arrays);
+    # if specialise is set, the products of small dense layers are unrolled
+    # with literal indices, so that the compiler sees the exact shapes
+    dtype = np.dtype(dtype)
+    arrays = []
+    lines = ['def forward(x{args}):', '    y = x']
+
+    def arg(a):
+        arrays.append(a)
+        return f'p{len(arrays)-1}'
+
+    def add_dense(layer):
+        w = arg(layer.w)
+        b = arg(layer.b)
+        lines.append(f'    z = np.empty({layer.Nout}, np.{dtype.name})')
+        if specialise and max(layer.Nin, layer.Nout) <= UNROLL_MAX_SIZE:
+            for i in range(layer.Nout):
+                terms = ' + '.join(f'{w}[{i}, {j}] * y[{j}]' for j in range(layer.Nin))
+                lines.append(f'    z[{i}] = {b}[{i}] + {terms}')
+        else:
+            lines.append(f'    _dense_forward({w}, {b}, y, z)')
+        if isinstance(layer.activation, TanhActivation):
+            lines.append('    y = np.tanh(z)')
+        elif isinstance(layer.activation, ReluActivation):
+            lines.append('    y = np.maximum(z, 0.0, z)')
+        elif isinstance(layer.activation, LinearActivation):
+            lines.append('    y = z')
+        else:
+            raise NotImplementedError(f'no compiled forward for {type(layer.activation).__name__}')
+
+    def add_normalisation(layer):
+        lines.append(f'    y = {arg(layer.alpha)} * y + {arg(layer.beta)}')
+
+    for layer in layers:
+        if isinstance(layer, DenseLayer):
+            add_dense(layer)
+        elif isinstance(layer, FusedDenseLayer):
+            add_dense(layer.dense)
+            add_normalisation(layer)
+        elif isinstance(layer, NormalisationLayer):
+            add_normalisation(layer)
+        # dropout layers are the identity in the forward
+
+    lines.append('    return y')
+    lines.append('')
+    lines.append('def forward_batch(x{args}):')
+    lines.append(f'    y = np.empty((x.shape[0], {layers[-1].Nout}), np.{dtype.name})')
+    lines.append('    for i in prange(x.shape[0]):')
+    lines.append('        y[i] = forward(x[i]{args})')
+    lines.append('    return y')
+    source = '\n'.join(lines).format(args=''.join(f', p{i}' for i in range(len(arrays))))
+
+    namespace = dict(np=np, prange=prange, _dense_forward=_dense_forward)
+    exec(source, namespace)
+    namespace['forward'] = forward = njit(namespace['forward'])
+    forward_batch = njit(parallel=True)(namespace['forward_batch'])
+
+    def apply(x):
+        x = np.asarray(x, dtype=dtype)
+        if x.ndim == 1:
+            return forward(x, *arrays)
+        return forward_batch(x, *arrays)
+
+    return apply
+
 class SequentialNetwork:
 
     def __init__(self):
+        # the dtype is that of the inputs and parameters, the layers are built
+        # in double precision, only optimised copies (for the forward) can be
+        # cast to single precision by optimise
+        self.dtype = np.float64
         self.layers = []
+        self._compiled = None
+        self._flat_key = None
+        self._flat_params = None
+        self._first_with_parameters = None
+        self._offsets = None
+        self._permutation = None
 
     def add_layer(self, name, *args, **kwargs):
         self.layers.append(construct_layer(name, *args, **kwargs))
@@ -246,15 +571,42 @@ class SequentialNetwork:
     def num_parameters(self):
         return sum((layer.num_parameters for layer in self.layers))
 
+    def finalise(self):
+        # gathers the parameters of all layers in a single flat buffer, of which
+        # the layer parameters become views;
+        # this is done again (lazily) whenever the list of layers has changed;
+        # the key holds the layers themselves (compared by identity), since the
+        # id of a removed layer can be reused by a new one
+        key = tuple(self.layers)
+        if self._flat_key == key:
+            return
+        self._flat_params = self.join_parameters([layer.parameters for layer in self.layers])
+        # the empty parameters of the other layers would promote single precision
+        self._flat_params = self._flat_params.astype(self.dtype, copy=False)
+        for (layer, pi) in zip(self.layers, self.split_parameters(self._flat_params)):
+            if isinstance(layer, (DenseLayer, FusedDenseLayer)):
+                layer.bind(pi)
+            else:
+                layer.parameters = pi
+        # the adjoint with respect to the parameters stops at this layer
+        self._first_with_parameters = next((i for (i, layer) in enumerate(self.layers)
+            if layer.num_parameters > 0), len(self.layers))
+        self._offsets = np.cumsum([0]+[layer.num_parameters for layer in self.layers]).tolist()
+        self._flat_key = key
+        # the compiled forward refers to the previous parameter arrays
+        self._compiled = None
+        self._permutation = None
+
     @property
     def parameters(self):
-        return self.join_parameters([layer.parameters for layer in self.layers])
+        # a copy, the parameters are modified with the setter
+        self.finalise()
+        return np.copy(self._flat_params)
 
     @parameters.setter
     def parameters(self, p):
-        p_list = self.split_parameters(p)
-        for (layer, pi) in zip(self.layers, p_list):
-            layer.parameters[:] = pi
+        self.finalise()
+        self._flat_params[:] = p
 
     @property
     def keras_parameters(self):
@@ -285,14 +637,37 @@ class SequentialNetwork:
     def join_parameters(self, p_list):
         return np.concatenate(p_list)
 
-    def initialise(self, initialisation):
+    def fortran_to_numpy_permutation(self):
+        # indices such that p[..., perm] is the numpy ordering of the fortran
+        # parameters p, computed once per list of layers
+        self.finalise()
+        if self._permutation is None:
+            p_list = self.split_parameters(np.arange(self.num_parameters, dtype=np.float64))
+            perm = self.join_parameters([layer.fortran_to_numpy_parameters(pi)
+                for (layer, pi) in zip(self.layers, p_list)])
+            self._permutation = perm.astype(np.intp)
+        return self._permutation
+
+    def fortran_to_numpy_parameters(self, p):
+        # p can be a single parameter vector or a batch of them
+        return np.asarray(p)[..., self.fortran_to_numpy_permutation()]
+
+    def numpy_to_fortran_parameters(self, p):
+        p = np.asarray(p)
+        q = np.empty_like(p)
+        q[..., self.fortran_to_numpy_permutation()] = p
+        return q
+
+    def initialise(self, initialisation, rng=None):
         for layer in self.layers:
-            layer.initialise(initialisation)
+            layer.initialise(initialisation, rng=rng)
 
-    def apply(self, x):
-        for layer in self.layers:
+    def apply(self, x, out=None):
+        # the output of the last layer is written in out (if given)
+        x = np.asarray(x, dtype=self.dtype)
+        for layer in self.layers[:-1]:
             x = layer.apply(x)
-        return x
+        return self.layers[-1].apply(x, out=out)
 
     def apply_linearise(self, x):
         for layer in self.layers:
@@ -305,24 +680,87 @@ class SequentialNetwork:
         return dx
 
     def apply_adjoint_x(self, dy):
-        for layer in self.layers[::-1]:
+        for layer in reversed(self.layers):
             dy = layer.apply_adjoint_x(dy)
         return dy
 
     def apply_tangent_linear_p(self, dp):
-        dp_list = self.split_parameters(dp)
-        dy = self.layers[0].apply_tangent_linear_p(dp_list[0])
-        for (layer, dpi) in zip(self.layers[1:], dp_list[1:]):
-            dy = layer.apply_tangent_linear_x(dy) + layer.apply_tangent_linear_p(dpi)
+        # layers without parameters only propagate the increment of the previous
+        # layers, and nothing at all before the first layer with parameters
+        dy = None
+        for (layer, dpi) in zip(self.layers, self.split_parameters(dp)):
+            if layer.num_parameters == 0:
+                if dy is not None:
+                    dy = layer.apply_tangent_linear_x(dy)
+            elif dy is None:
+                dy = layer.apply_tangent_linear_p(dpi)
+            else:
+                dy = layer.apply_tangent_linear_x(dy) + layer.apply_tangent_linear_p(dpi)
+        if dy is None:
+            return np.zeros(self.layers[-1].Nout)
         return dy
 
-    def apply_adjoint_p(self, dy):
-        dp_list = []
-        for layer in self.layers[::-1][:-1]:
-            dp_list.append(layer.apply_adjoint_p(dy))
-            dy = layer.apply_adjoint_x(dy)
-        dp_list.append(self.layers[0].apply_adjoint_p(dy))
-        return self.join_parameters(dp_list[::-1])
+    def apply_adjoint_p(self, dy, out=None):
+        # the layers write their adjoint directly in the slices of out (if given),
+        # the slices of the layers without parameters are empty; a batch of dy of
+        # shape (Ne, Nout) gives an output of shape (Ne, num_parameters)
+        self.finalise()
+        if out is None:
+            dp = np.empty(dy.shape[:-1]+(self.num_parameters,))
+        else:
+            dp = out
+        layers = self.layers
+        offsets = self._offsets
+        first = self._first_with_parameters
+        for i in range(len(layers)-1, first, -1):
+            if layers[i].num_parameters > 0:
+                layers[i].apply_adjoint_p(dy, out=dp[..., offsets[i]:offsets[i+1]])
+            dy = layers[i].apply_adjoint_x(dy)
+        if first < len(layers):
+            layers[first].apply_adjoint_p(dy, out=dp[..., offsets[first]:offsets[first+1]])
+        return dp
+
+    def compile_numba(self, specialise=False):
+        # returns a jit-compiled forward for the current layers (cached),
+        # or the usual forward if numba is not available; the layers are
+        # bound to the flat buffer first, so that the compiled forward reads
+        # the same arrays as the parameters setter writes
+        if njit is None:
+            return self.apply
+        self.finalise()
+        key = (tuple(self.layers), specialise)
+        if self._compiled is None or self._compiled[0] != key:
+            self._compiled = (key, compile_forward(self.layers, self.dtype, specialise))
+        return self._compiled[1]
+
+    def optimise(self, dtype=np.float64):
+        # returns a copy of the network, for the forward only, in which
+        # dropout layers are removed, a normalisation followed by a dense layer
+        # is folded into the dense weights, and a dense layer followed by a
+        # normalisation is fused into a single layer; the copy is cast to dtype
+        # (e.g. np.float32) once the folding is done in double precision
+        layers = []
+        for layer in self.layers:
+            previous = layers[-1] if layers else None
+            if isinstance(layer, DropoutLayer):
+                continue
+            if isinstance(layer, DenseLayer):
+                if isinstance(previous, NormalisationLayer):
+                    w = layer.w * previous.alpha
+                    b = layer.w @ previous.beta + layer.b
+                    layers[-1] = dense_from_weights(w, b, layer.activation)
+                else:
+                    layers.append(dense_from_weights(layer.w, layer.b, layer.activation))
+            elif isinstance(layer, NormalisationLayer):
+                normalisation = NormalisationLayer(layer.Nin, np.copy(layer.alpha), np.copy(layer.beta))
+                if isinstance(previous, DenseLayer):
+                    layers[-1] = FusedDenseLayer(previous, normalisation)
+                else:
+                    layers.append(normalisation)
+        network = SequentialNetwork()
+        network.dtype = dtype
+        network.layers = [layer.astype(dtype) for layer in layers]
+        return network
 
     def apply_tangent_linear(self, dp, dx):
         dyp = self.apply_tangent_linear_p(dp)
@@ -347,5 +785,37 @@ def fromfile(filename):
         else:
             print('unknown network type:', net_name)
 
+def fromfile_bin(filename):
+    with open(filename, 'rb') as f:
+        net_name = read_bin_string(f)
+        if net_name == 'sequential':
+            network = SequentialNetwork()
+            num_layers = read_bin_int(f)
+            for i in range(num_layers):
+                layer = layer_fromfile_bin(f)
+                network.layers.append(layer)
+            return network
+        else:
+            print('unknown network type:', net_name)
+
+#--------------------------------------------------
+# fortran output
+#--------------------------------------------------
+
+def read_fortran_records(filename, dtype='f8'):
+    # returns the records of an unformatted (sequential) fortran file, each
+    # stored as [int32 length in bytes][data][int32 length in bytes]; the file
+    # is read at once and the records are views of the (writable) buffer
+    with open(filename, 'rb') as f:
+        data = bytearray(f.read())
+    itemsize = np.dtype(dtype).itemsize
+    records = []
+    offset = 0
+    while offset < len(data):
+        n = int.from_bytes(data[offset:offset+4], 'little')
+        records.append(np.frombuffer(data, dtype=dtype, count=n//itemsize, offset=offset+4))
+        offset += n+8
+    return records
+
 #--------------------------------------------------
 
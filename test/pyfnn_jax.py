@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+# jax mirror of the sequential networks of pyfnn, used to run the gradient
+# and adjoint tests with jit and vmap: the architecture (including the
+# normalisation constants) is taken from a pyfnn network, and all operators
+# are pure functions of the flat parameter vector (same layout as pyfnn)
+
+import jax
+import jax.numpy as jnp
+from pyfnn import DenseLayer, NormalisationLayer, LinearActivation, TanhActivation, ReluActivation
+
+# the tests require double precision
+jax.config.update('jax_enable_x64', True)
+
+#--------------------------------------------------
+# architecture
+#--------------------------------------------------
+
+def describe(network):
+    # returns the list of layers as (kind, Nin, Nout, activation or (alpha, beta))
+    arch = []
+    for layer in network.layers:
+        if isinstance(layer, DenseLayer):
+            if isinstance(layer.activation, TanhActivation):
+                activation = 'tanh'
+            elif isinstance(layer.activation, ReluActivation):
+                activation = 'relu'
+            elif isinstance(layer.activation, LinearActivation):
+                activation = 'linear'
+            else:
+                raise NotImplementedError(f'no jax mirror for {type(layer.activation).__name__}')
+            arch.append(('dense', layer.Nin, layer.Nout, activation))
+        elif isinstance(layer, NormalisationLayer):
+            arch.append(('normalisation', layer.Nin, layer.Nout,
+                (jnp.asarray(layer.alpha), jnp.asarray(layer.beta))))
+        # dropout layers are the identity
+    return arch
+
+def num_parameters(arch):
+    return sum(Nout*(Nin+1) for (kind, Nin, Nout, _) in arch if kind == 'dense')
+
+def split_parameters(arch, p):
+    # returns the (b, w) of each dense layer
+    p_list = []
+    index = 0
+    for (kind, Nin, Nout, _) in arch:
+        if kind == 'dense':
+            b = p[index:index+Nout]
+            w = p[index+Nout:index+Nout*(Nin+1)].reshape((Nout, Nin))
+            p_list.append((b, w))
+            index += Nout*(Nin+1)
+        else:
+            p_list.append(None)
+    return p_list
+
+def join_parameters(arch, dp_list):
+    return jnp.concatenate([jnp.concatenate([dpi[0], dpi[1].ravel()])
+        for (layer, dpi) in zip(arch, dp_list) if layer[0] == 'dense'])
+
+#--------------------------------------------------
+# operators
+#--------------------------------------------------
+
+def activation_linearise(activation, z):
+    if activation == 'tanh':
+        y = jnp.tanh(z)
+        return (y, 1 - y*y)
+    if activation == 'relu':
+        return (jnp.maximum(z, 0), (z > 0).astype(z.dtype))
+    return (z, jnp.ones_like(z))
+
+def apply_linearise(arch, p, x):
+    # returns the output and the linearisation (input and activation derivative of each layer)
+    cache = []
+    for ((kind, _, _, extra), pi) in zip(arch, split_parameters(arch, p)):
+        if kind == 'dense':
+            (b, w) = pi
+            (y, prime) = activation_linearise(extra, w@x + b)
+            cache.append((x, prime))
+            x = y
+        else:
+            (alpha, beta) = extra
+            cache.append(None)
+            x = alpha * x + beta
+    return (x, cache)
+
+def apply(arch, p, x):
+    return apply_linearise(arch, p, x)[0]
+
+def apply_tangent_linear(arch, p, cache, dp, dx):
+    p_list = split_parameters(arch, p)
+    dp_list = split_parameters(arch, dp)
+    for ((kind, _, _, extra), pi, dpi, ci) in zip(arch, p_list, dp_list, cache):
+        if kind == 'dense':
+            ((_, w), (db, dw), (x, prime)) = (pi, dpi, ci)
+            dx = prime * (w@dx + dw@x + db)
+        else:
+            (alpha, _) = extra
+            dx = alpha * dx
+    return dx
+
+def apply_adjoint(arch, p, cache, dy):
+    p_list = split_parameters(arch, p)
+    dp_list = []
+    for ((kind, _, _, extra), pi, ci) in list(zip(arch, p_list, cache))[::-1]:
+        if kind == 'dense':
+            ((_, w), (x, prime)) = (pi, ci)
+            db = prime * dy
+            dp_list.append((db, jnp.outer(db, x)))
+            dy = w.T@db
+        else:
+            (alpha, _) = extra
+            dp_list.append(None)
+            dy = alpha * dy
+    return (join_parameters(arch, dp_list[::-1]), dy)
+
+#--------------------------------------------------
+# tests
+#--------------------------------------------------
+
+def relative_error(d1, d2):
+    return jnp.abs(2*(d1-d2)/(d1+d2)).max()
+
+def gradient_test(network, list_eps, Ne, key):
+    # returns the relative errors, with shape (list_eps.size, Ne)
+    arch = describe(network)
+    Nx = arch[0][1]
+    Np = num_parameters(arch)
+    list_eps = jnp.asarray(list_eps)
+
+    def single_test(key):
+        (kp, kx, kdx, kdp) = jax.random.split(key, 4)
+        p = jax.random.normal(kp, (Np,))
+        x = jax.random.normal(kx, (Nx,))
+        dx = jax.random.normal(kdx, (Nx,))
+        dp = jax.random.normal(kdp, (Np,))
+        (y, cache) = apply_linearise(arch, p, x)
+        dy = apply_tangent_linear(arch, p, cache, dp, dx)
+
+        def test_eps(eps):
+            yp = apply(arch, p+eps*dp, x+eps*dx)
+            return relative_error(yp-y, eps*dy)
+
+        return jax.vmap(test_eps)(list_eps)
+
+    return jax.jit(jax.vmap(single_test))(jax.random.split(key, Ne)).T
+
+def adjoint_test(network, Ne, key):
+    # returns the relative errors, with shape (Ne,)
+    arch = describe(network)
+    Nx = arch[0][1]
+    Ny = arch[-1][2]
+    Np = num_parameters(arch)
+
+    def single_test(key):
+        (kp, kx, kdx, kdp, kdy) = jax.random.split(key, 5)
+        p = jax.random.normal(kp, (Np,))
+        x = jax.random.normal(kx, (Nx,))
+        dx = jax.random.normal(kdx, (Nx,))
+        dp = jax.random.normal(kdp, (Np,))
+        dy = jax.random.normal(kdy, (Ny,))
+        (_, cache) = apply_linearise(arch, p, x)
+        (dp_a, dx_a) = apply_adjoint(arch, p, cache, dy)
+        dy_tl = apply_tangent_linear(arch, p, cache, dp, dx)
+        return relative_error(dp_a@dp + dx_a@dx, dy_tl@dy)
+
+    return jax.jit(jax.vmap(single_test))(jax.random.split(key, Ne))
+
+#--------------------------------------------------
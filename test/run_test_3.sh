@@ -1,5 +1,2 @@
 #!/usr/bin/env sh
 python test_3.py
-rm test_3_model.h5
-rm test_3_model.txt
-rm test_3_out.bin
@@ -1,5 +1,2 @@
 #!/usr/bin/env sh
 python test_5.py
-rm test_5_model.h5
-rm test_5_model.txt
-rm test_5_out.bin
@@ -1,5 +1,2 @@
 #!/usr/bin/env sh
 python test_6.py
-rm test_6_model.h5
-rm test_6_model.txt
-rm test_6_out.bin
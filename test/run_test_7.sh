@@ -1,6 +1,2 @@
 #!/usr/bin/env sh
 python test_7.py
-rm test_7_model.h5
-rm test_7_model_in.txt
-rm test_7_model_out.txt
-rm test_7_out.bin
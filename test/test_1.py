@@ -1,4 +1,5 @@
 
+import os
 import numpy as np
 import tensorflow as tf
 from keras_to_fnn import keras_file_to_txt
@@ -8,40 +9,50 @@ from tqdm import trange
 # set double precision in tensorflow
 tf.keras.backend.set_floatx('float64')
 
-def unit_test(Ne):
+def compiled_forward(model):
+    # xla-compiled inference, which avoids the per-call overhead of model.predict
+    return tf.function(lambda x: model(x, training=False), jit_compile=True)
 
-    Nx = 5
-    Ni = 6
-    Ny = 4
+def construct_model(Nx, Ni, Ny):
+    model = tf.keras.Sequential()
+    model.add(tf.keras.Input(shape=(Nx,)))
+    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='relu'))
+    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='tanh'))
+    model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
+    return model
+
+def reinitialise(model):
+    # the model is built only once, and its weights are drawn again for each test
+    # with freshly seeded initialisers (same distribution as at construction)
+    initialiser = tf.keras.initializers.GlorotUniform
+    model.set_weights([initialiser(seed=np.random.randint(2**31))(w.shape, dtype=w.dtype)
+        for w in model.weights])
+
+def unit_test(model, forward, Ne):
+
+    Nx = model.input_shape[-1]
+    Ny = model.output_shape[-1]
 
     alpha = np.random.randn(Nx)
     beta = np.random.randn(Nx)
     gamma = np.random.randn(Ny)
     delta = np.random.randn(Ny)
 
-    model = tf.keras.Sequential()
-    model.add(tf.keras.Input(shape=(Nx,)))
-    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='relu'))
-    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='tanh'))
-    model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
-    model.compile(loss='mse')
+    reinitialise(model)
 
     x = np.random.randn(Ne, Nx)
     xn = alpha * x + beta
-    y1 = gamma * model.predict(xn) + delta
+    y1 = gamma * forward(tf.constant(xn)).numpy() + delta
 
     fname_1 = 'test_1_model.h5'
     fname_2 = 'test_1_model.txt'
 
     model.save(fname_1)
-    del model
     keras_file_to_txt(fname_2, fname_1, add_norm_in=True, norm_alpha_in=alpha, norm_beta_in=beta,
             add_norm_out=True, norm_alpha_out=gamma, norm_beta_out=delta)
 
-    model = fromfile(fname_2)
-    y2 = np.zeros((Ne, Ny))
-    for i in range(Ne):
-        y2[i] = model.apply(x[i])
+    network = fromfile(fname_2)
+    y2 = network.apply(x)
 
     return abs(2*(y1-y2)/(y1+y2)).max()
 
@@ -57,7 +68,11 @@ def multi_test(Ne, Nt):
     def print_float_line(key, value_a):
         print(f'{key:>{KEYSIZE}} {value_a:{VALUESIZE}.{PRECISION}f}')
 
-    error = np.array([unit_test(Ne) for _ in trange(Nt, desc='running unit tests')])
+    # the compiled forward is traced once, the weights are variables of the model
+    model = construct_model(5, 6, 4)
+    forward = compiled_forward(model)
+    error = np.array([unit_test(model, forward, Ne)
+        for _ in trange(Nt, desc='running unit tests', mininterval=0.5, disable=None)])
     print('-'*100)
     print('test #1')
     print('validation of forward and read of the python toolkit')
@@ -72,5 +87,40 @@ def multi_test(Ne, Nt):
     print_float_line('std', np.log10(error.std()))
     print('-'*100)
 
+def cache_test(model):
+
+    def print_string_line(key, value_a):
+        print(f'{key:>{KEYSIZE}} {value_a:>{VALUESIZE}}')
+
+    def print_float_line(key, value_a):
+        print(f'{key:>{KEYSIZE}} {value_a:{VALUESIZE}.{PRECISION}f}')
+
+    fname_1 = 'test_1_model.h5'
+    fname_2 = 'test_1_model.txt'
+
+    reinitialise(model)
+    model.save(fname_1)
+    keras_file_to_txt(fname_2, fname_1)
+
+    # the file is overwritten with new weights and given back its modification
+    # time, as on a filesystem with a coarse time resolution
+    stat = os.stat(fname_1)
+    reinitialise(model)
+    model.save(fname_1)
+    os.utime(fname_1, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    keras_file_to_txt(fname_2, fname_1)
+
+    p1 = np.concatenate([w.numpy().ravel() for w in model.weights])
+    p2 = fromfile(fname_2).keras_parameters
+
+    print('test #1b')
+    print('validation of the model cache of the converter')
+    print('with a model file overwritten in place')
+    print('-'*50)
+    print_string_line('', 'max error [abs., log10]')
+    print_float_line('', np.log10(abs(p1-p2).max()))
+    print('-'*100)
+
 multi_test(100, 10)
+cache_test(construct_model(5, 6, 4))
 
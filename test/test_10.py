@@ -3,8 +3,7 @@ import numpy as np
 import tensorflow as tf
 from keras_to_fnn import keras_file_to_txt
 from subprocess import run as srun
-from pyfnn import fromfile
-from scipy.io import FortranFile
+from pyfnn import fromfile, read_fortran_records
 from tqdm import trange
 
 # set double precision in tensorflow
@@ -33,7 +32,6 @@ def unit_test(list_rates, Nt):
         model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', 
             activation='tanh'))
         model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
-        model.compile(loss='mse')
 
         fname_1 = 'test_10_model.h5'
         fname_2 = 'test_10_model.txt'
@@ -53,21 +51,21 @@ def unit_test(list_rates, Nt):
         model = fromfile(fname_2)
 
         Ne = 100
-        f = FortranFile('test_10_out.bin', 'r')
-        x = f.read_reals(fortran_float).reshape((Ne, Nx))
-        y1 = f.read_reals(fortran_float).reshape((Ne, Ny))
-        y2 = np.zeros((Ne, Ny))
-        f.close()
+        records = read_fortran_records('test_10_out.bin', fortran_float)
+        x = records[0].reshape((Ne, Nx))
+        y1 = records[1].reshape((Ne, Ny))
 
-        for i in range(Ne):
-            # this model ignores dropout
-            y2[i] = model.apply(x[i])
+        # this model ignores dropout
+        y2 = model.apply(x)
 
-        return np.sqrt(np.mean(np.square(2*(y1-y2)/(y1+y2))))
+        # relative rms error, the sum of squares is a single dot product
+        r = y1 - y2
+        r /= y1 + y2
+        return 2*np.sqrt(np.vdot(r, r)/r.size)
 
     error = np.zeros((len(list_rates), Nt))
     for (j, rate) in enumerate(list_rates):
-        for t in trange(Nt, desc=f'testing rate {rate}'):
+        for t in trange(Nt, desc=f'testing rate {rate}', mininterval=0.5, disable=None):
             error[j, t] = test_one(rate)
 
     return error
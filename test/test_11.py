@@ -0,0 +1,125 @@
+
+import numpy as np
+import jax
+from pyfnn import SequentialNetwork
+from pyfnn_jax import describe, apply_linearise, apply_tangent_linear, apply_adjoint
+from pyfnn_jax import gradient_test, adjoint_test
+
+def construct_network():
+
+    Nx = 5
+    Ni = 6
+    Ny = 4
+
+    alpha = np.random.randn(Nx)
+    beta = np.random.randn(Nx)
+    gamma = np.random.randn(Ny)
+    delta = np.random.randn(Ny)
+
+    network = SequentialNetwork()
+    network.add_layer('normalisation', Nx, alpha, beta)
+    network.add_layer('dense', Nx, Ni, activation='relu', initialisation='randn')
+    network.add_layer('dense', Ni, Ni, activation='tanh', initialisation='randn')
+    network.add_layer('dense', Ni, Ny, activation='linear', initialisation='randn')
+    network.add_layer('normalisation', Ny, gamma, delta)
+
+    return network
+
+def multi_test_gradient(Ne, key):
+
+    list_eps = np.power(10, -1.-np.arange(15))
+    error = np.asarray(gradient_test(construct_network(), list_eps, Ne, key))
+
+    KEYSIZE = 10
+    VALUESIZE = 25
+    PRECISION = 5
+
+    def print_string_line(key, value_a, value_b):
+        print(f'{key:>{KEYSIZE}} {value_a:>{VALUESIZE}} {value_b:>{VALUESIZE}}')
+
+    def print_float_line(key, value_a, value_b):
+        print(f'{key:{KEYSIZE}.{PRECISION}f} {value_a:{VALUESIZE}.{PRECISION}f} {value_b:{VALUESIZE}.{PRECISION}f}')
+
+    print('-'*100)
+    print('test #11a')
+    print('validation of the gradient of the jax mirror of the python toolkit')
+    print(f'number of points per test = {Ne}')
+    print('-'*75)
+    print_string_line('eps [log10]', 'mean error [rel, log10]', 'std error [rel, log10]')
+    for (i, eps) in enumerate(list_eps):
+        print_float_line(np.log10(eps), np.log10(error[i].mean()), np.log10(error[i].std()))
+    print('-'*75)
+
+def multi_test_adjoint(Ne, key):
+
+    error = np.asarray(adjoint_test(construct_network(), Ne, key))
+
+    KEYSIZE = 25
+    VALUESIZE = 25
+    PRECISION = 5
+
+    def print_string_line(key, value_a):
+        print(f'{key:>{KEYSIZE}} {value_a:>{VALUESIZE}}')
+
+    def print_float_line(key, value_a):
+        print(f'{key:{KEYSIZE}.{PRECISION}f} {value_a:{VALUESIZE}.{PRECISION}f}')
+
+    print('test #11b')
+    print('validation of the adjoint of the jax mirror of the python toolkit')
+    print(f'number of points per test = {Ne}')
+    print('-'*75)
+    print_string_line('mean error [rel, log10]', 'std error [rel, log10]')
+    print_float_line(np.log10(error.mean()), np.log10(error.std()))
+    print('-'*75)
+
+def test_one_consistency(network, arch, rng):
+
+    network.initialise('randn', rng=rng)
+    p = np.copy(network.parameters)
+    (x, dx) = rng.standard_normal((2, network.layers[0].Nin))
+    dp = rng.standard_normal(network.num_parameters)
+    dy = rng.standard_normal(network.layers[-1].Nout)
+
+    y = network.apply_linearise(x)
+    dy_tl = network.apply_tangent_linear(dp, dx)
+    (dp_a, dx_a) = network.apply_adjoint(dy)
+
+    (y_j, cache) = apply_linearise(arch, p, x)
+    dy_tl_j = apply_tangent_linear(arch, p, cache, dp, dx)
+    (dp_a_j, dx_a_j) = apply_adjoint(arch, p, cache, dy)
+
+    # the adjoint is zero when no relu is active, hence the lower bound
+    tiny = np.finfo(np.float64).tiny
+    return [abs(np.asarray(b)-a).max()/max(abs(a).max(), tiny)
+        for (a, b) in zip((y, dy_tl, dp_a, dx_a), (y_j, dy_tl_j, dp_a_j, dx_a_j))]
+
+def multi_test_consistency(Ne, rng):
+
+    list_operators = ['forward', 'tangent linear', 'adjoint [p]', 'adjoint [x]']
+    network = construct_network()
+    arch = describe(network)
+    error = np.array([test_one_consistency(network, arch, rng) for _ in range(Ne)]).T
+
+    KEYSIZE = 20
+    VALUESIZE = 25
+    PRECISION = 5
+
+    def print_string_line(key, value_a, value_b):
+        print(f'{key:>{KEYSIZE}} {value_a:>{VALUESIZE}} {value_b:>{VALUESIZE}}')
+
+    def print_float_line(key, value_a, value_b):
+        print(f'{key:>{KEYSIZE}} {value_a:{VALUESIZE}.{PRECISION}f} {value_b:{VALUESIZE}.{PRECISION}f}')
+
+    print('test #11c')
+    print('comparison of the jax mirror with the python toolkit')
+    print(f'number of points per test = {Ne}')
+    print('-'*75)
+    print_string_line('operator', 'mean error [rel, log10]', 'max error [rel, log10]')
+    for (i, operator) in enumerate(list_operators):
+        print_float_line(operator, np.log10(error[i].mean()), np.log10(error[i].max()))
+    print('-'*100)
+
+(key_gradient, key_adjoint) = jax.random.split(jax.random.PRNGKey(np.random.randint(2**31)))
+multi_test_gradient(10000, key_gradient)
+multi_test_adjoint(10000, key_adjoint)
+multi_test_consistency(100, np.random.default_rng())
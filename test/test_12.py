@@ -0,0 +1,89 @@
+
+import os
+import numpy as np
+import tensorflow as tf
+from keras_to_fnn import keras_to_bin
+from subprocess import run as srun
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+from pyfnn import fromfile_bin, read_fortran_records
+from tqdm import tqdm
+
+# set double precision in tensorflow
+tf.keras.backend.set_floatx('float64')
+
+# the tests run concurrently, one per process
+tf.config.threading.set_intra_op_parallelism_threads(1)
+tf.config.threading.set_inter_op_parallelism_threads(1)
+
+# use double format in fortan
+fortran_float = 'f8'
+
+def unit_test(Ne, seed):
+
+    Nx = 5
+    Ni = 6
+    Ny = 4
+
+    tf.keras.utils.set_random_seed(int(seed))
+    rng = np.random.default_rng(seed)
+    (alpha, beta) = rng.standard_normal((2, Nx))
+    (gamma, delta) = rng.standard_normal((2, Ny))
+
+    model = tf.keras.Sequential()
+    model.add(tf.keras.Input(shape=(Nx,)))
+    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='relu'))
+    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='tanh'))
+    model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
+
+    with TemporaryDirectory() as workdir:
+        fname_2 = os.path.join(workdir, 'test_12_model.bin')
+        keras_to_bin(fname_2, model, add_norm_in=True, norm_alpha_in=alpha, norm_beta_in=beta, 
+                add_norm_out=True, norm_alpha_out=gamma, norm_beta_out=delta)
+
+        srun([os.path.abspath('test_12.x')], cwd=workdir)
+
+        model = fromfile_bin(fname_2)
+
+        records = read_fortran_records(os.path.join(workdir, 'test_12_out.bin'), fortran_float)
+        x = records[0].reshape(Ne, Nx)
+        y1 = records[1].reshape(Ne, Ny)
+
+        y2 = model.apply(x)
+
+        return abs(2*(y1-y2)/(y1+y2)).max()
+
+KEYSIZE = 10
+VALUESIZE = 25
+PRECISION = 5
+
+def multi_test(Ne, Nt):
+
+    def print_string_line(key, value_a):
+        print(f'{key:>{KEYSIZE}} {value_a:>{VALUESIZE}}') 
+
+    def print_float_line(key, value_a):
+        print(f'{key:>{KEYSIZE}} {value_a:{VALUESIZE}.{PRECISION}f}')
+
+    with ProcessPoolExecutor(min(os.cpu_count(), Nt), mp_context=get_context('spawn')) as executor:
+        futures = [executor.submit(unit_test, Ne, seed) for seed in np.random.randint(2**31, size=Nt)]
+        error = np.array([future.result()
+            for future in tqdm(futures, desc='running unit tests', mininterval=0.5, disable=None)])
+    print('-'*100)
+    print('test #12')
+    print('validation of forward and binary read of the fortran module')
+    print(f'number of tests = {Nt}')
+    print(f'number of points per test = {Ne}')
+    print('-'*50)
+    print_string_line('test id', 'max error [rel.]')
+    for (i, e) in enumerate(error):
+        print_float_line(i, e)
+    print('-'*50)
+    print_float_line('mean', error.mean())
+    print_float_line('std', error.std())
+    print('-'*100)
+
+if __name__ == '__main__':
+    multi_test(100, 10)
+
@@ -2,34 +2,56 @@
 import numpy as np
 from pyfnn import SequentialNetwork
 
-def unit_test_gradient(list_eps, Ne):
+rng = np.random.default_rng()
+
+def test_one_gradient(network, rng, list_eps):
+
+    network.initialise('randn', rng=rng)
+    (x, dx) = rng.standard_normal((2, network.layers[0].Nin))
+    y = network.apply_linearise(x)
+
+    dp = rng.standard_normal(network.num_parameters)
+    dy = network.apply_tangent_linear(dp, dx)
+
+    # the perturbed outputs are computed with the forward of the network itself
+    p = np.copy(network.parameters)
+    eps = list_eps[:, None]
+    yp = np.empty((list_eps.size, dy.size))
+    for (i, eps_i) in enumerate(list_eps):
+        network.parameters = p + eps_i * dp
+        yp[i] = network.apply(x + eps_i * dx)
+    network.parameters = p
+
+    d1 = yp-y
+    d2 = eps*dy
+
+    return abs(2*(d1-d2)/(d1+d2)).max(axis=1)
 
-    def test_one(network, eps):
+def test_one_adjoint(network, rng):
 
-        network.initialise('randn')
-        x = np.random.randn(network.layers[0].Nin)
-        y = network.apply_linearise(x)
+    network.initialise('randn', rng=rng)
+    (x, dx) = rng.standard_normal((2, network.layers[0].Nin))
+    y = network.apply_linearise(x)
 
-        dx = np.random.randn(network.layers[0].Nin)
-        dp = np.random.randn(network.num_parameters)
-        dy = network.apply_tangent_linear(dp, dx)
+    dp = rng.standard_normal(network.num_parameters)
+    dy = rng.standard_normal(network.layers[-1].Nout)
 
-        network.parameters += eps * dp
-        yp = network.apply(x+eps*dx)
+    dp_a, dx_a = network.apply_adjoint(dy)
+    dy_tl = network.apply_tangent_linear(dp, dx)
 
-        d1 = yp-y
-        d2 = eps*dy
+    d1 = dp_a @ dp + dx_a @ dx
+    d2 = dy_tl @ dy
 
-        return abs(2*(d1-d2)/(d1+d2)).max()
+    return abs(2*(d1-d2)/(d1+d2)).max()
+
+def unit_test_gradient(list_eps, Ne):
 
     Nx = 5
     Ni = 6
     Ny = 4
 
-    alpha = np.random.randn(Nx)
-    beta = np.random.randn(Nx)
-    gamma = np.random.randn(Ny)
-    delta = np.random.randn(Ny)
+    (alpha, beta) = rng.standard_normal((2, Nx))
+    (gamma, delta) = rng.standard_normal((2, Ny))
 
     network = SequentialNetwork()
     network.add_layer('normalisation', Nx, alpha, beta)
@@ -38,12 +60,7 @@ def unit_test_gradient(list_eps, Ne):
     network.add_layer('dense', Ni, Ny, activation='linear', initialisation='randn')
     network.add_layer('normalisation', Ny, gamma, delta)
 
-    error = np.zeros((list_eps.size, Ne))
-    for (j, eps) in enumerate(list_eps):
-        for i in range(Ne):
-            error[j, i] = test_one(network, eps)
-
-    return error
+    return np.array([test_one_gradient(network, rng, list_eps) for _ in range(Ne)]).T
 
 def multi_test_gradient(Ne):
 
@@ -72,32 +89,12 @@ def multi_test_gradient(Ne):
 
 def unit_test_adjoint(Ne):
 
-    def test_one(network):
-
-        network.initialise('randn')
-        x = np.random.randn(network.layers[0].Nin)
-        y = network.apply_linearise(x)
-
-        dx = np.random.randn(network.layers[0].Nin)
-        dp = np.random.randn(network.num_parameters)
-        dy = np.random.randn(network.layers[-1].Nout)
-
-        dp_a, dx_a = network.apply_adjoint(dy)
-        dy_tl = network.apply_tangent_linear(dp, dx)
-
-        d1 = dp_a @ dp + dx_a @ dx
-        d2 = dy_tl @ dy
-
-        return abs(2*(d1-d2)/(d1+d2)).max()
-
     Nx = 5
     Ni = 6
     Ny = 4
 
-    alpha = np.random.randn(Nx)
-    beta = np.random.randn(Nx)
-    gamma = np.random.randn(Ny)
-    delta = np.random.randn(Ny)
+    (alpha, beta) = rng.standard_normal((2, Nx))
+    (gamma, delta) = rng.standard_normal((2, Ny))
 
     network = SequentialNetwork()
     network.add_layer('normalisation', Nx, alpha, beta)
@@ -106,11 +103,7 @@ def unit_test_adjoint(Ne):
     network.add_layer('dense', Ni, Ny, activation='linear', initialisation='randn')
     network.add_layer('normalisation', Ny, gamma, delta)
 
-    error = np.zeros((Ne))
-    for i in range(Ne):
-        error[i] = test_one(network)
-
-    return error
+    return np.array([test_one_adjoint(network, rng) for _ in range(Ne)])
 
 def multi_test_adjoint(Ne):
 
@@ -132,8 +125,67 @@ def multi_test_adjoint(Ne):
     print('-'*75)
     print_string_line('mean error [rel, log10]', 'std error [rel, log10]')
     print_float_line(np.log10(error.mean()), np.log10(error.std()))
+    print('-'*75)
+
+def test_one_optimise(network, rng, Nb, compiled):
+
+    # the parameters are set after the compilation, through the flat buffer
+    network.parameters = rng.standard_normal(network.num_parameters)
+    x = rng.standard_normal((Nb, network.layers[0].Nin))
+    y = network.apply(x)
+
+    forwards = [network.optimise().apply, network.optimise(np.float32).apply] + compiled
+
+    return [abs(forward(x)-y).max()/abs(y).max() for forward in forwards]
+
+def unit_test_optimise(Ne, Nb):
+
+    Nx = 5
+    Ni = 6
+    Ny = 4
+
+    (alpha, beta) = rng.standard_normal((2, Nx))
+    (gamma, delta) = rng.standard_normal((2, Ny))
+
+    network = SequentialNetwork()
+    network.add_layer('normalisation', Nx, alpha, beta)
+    network.add_layer('dense', Nx, Ni, activation='relu', initialisation='randn')
+    network.add_layer('dense', Ni, Ni, activation='tanh', initialisation='randn')
+    network.add_layer('dense', Ni, Ny, activation='linear', initialisation='randn')
+    network.add_layer('normalisation', Ny, gamma, delta)
+
+    # the compiled forwards read the parameters in place, hence they are compiled once
+    compiled = [network.compile_numba(), network.compile_numba(specialise=True)]
+
+    return np.array([test_one_optimise(network, rng, Nb, compiled) for _ in range(Ne)]).T
+
+def multi_test_optimise(Ne, Nb):
+
+    list_forwards = ['optimise', 'optimise [float32]', 'numba', 'numba [specialised]']
+    error = unit_test_optimise(Ne, Nb)
+
+    KEYSIZE = 20
+    VALUESIZE = 25
+    PRECISION = 5
+
+    def print_string_line(key, value_a, value_b):
+        print(f'{key:>{KEYSIZE}} {value_a:>{VALUESIZE}} {value_b:>{VALUESIZE}}')
+
+    def print_float_line(key, value_a, value_b):
+        print(f'{key:>{KEYSIZE}} {value_a:{VALUESIZE}.{PRECISION}f} {value_b:{VALUESIZE}.{PRECISION}f}')
+
+    print('test #2c')
+    print('validation of the optimised forwards of the python toolkit')
+    print(f'number of batches per test = {Ne}')
+    print(f'number of points per batch = {Nb}')
+    print('-'*75)
+    print_string_line('forward', 'mean error [rel, log10]', 'max error [rel, log10]')
+    for (i, forward) in enumerate(list_forwards):
+        print_float_line(forward, np.log10(error[i].mean()), np.log10(error[i].max()))
     print('-'*100)
 
-multi_test_gradient(100)
-multi_test_adjoint(100)
+if __name__ == '__main__':
+    multi_test_gradient(100)
+    multi_test_adjoint(100)
+    multi_test_optimise(100, 32)
 
@@ -3,8 +3,7 @@ import numpy as np
 import tensorflow as tf
 from keras_to_fnn import keras_file_to_txt
 from subprocess import run as srun
-from pyfnn import fromfile
-from scipy.io import FortranFile
+from pyfnn import fromfile, read_fortran_records
 from tqdm import trange
 
 # set double precision in tensorflow
@@ -13,48 +12,52 @@ tf.keras.backend.set_floatx('float64')
 # use double format in fortan
 fortran_float = 'f8'
 
-def unit_test(Ne):
+def construct_model(Nx, Ni, Ny):
+    model = tf.keras.Sequential()
+    model.add(tf.keras.Input(shape=(Nx,)))
+    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='relu'))
+    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='tanh'))
+    model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
+    return model
+
+def reinitialise(model):
+    # the model is built only once, and its weights are drawn again for each test
+    # with freshly seeded initialisers (same distribution as at construction)
+    initialiser = tf.keras.initializers.GlorotUniform
+    model.set_weights([initialiser(seed=np.random.randint(2**31))(w.shape, dtype=w.dtype)
+        for w in model.weights])
 
-    Nx = 5
-    Ni = 6
-    Ny = 4
+def unit_test(model, Ne):
+
+    Nx = model.input_shape[-1]
+    Ny = model.output_shape[-1]
 
     alpha = np.random.randn(Nx)
     beta = np.random.randn(Nx)
     gamma = np.random.randn(Ny)
     delta = np.random.randn(Ny)
 
-    model = tf.keras.Sequential()
-    model.add(tf.keras.Input(shape=(Nx,)))
-    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='relu'))
-    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='tanh'))
-    model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
-    model.compile(loss='mse')
+    reinitialise(model)
 
     fname_1 = 'test_4_model.h5'
     fname_2 = 'test_4_model.txt'
     model.save(fname_1)
-    del model
     keras_file_to_txt(fname_2, fname_1, add_norm_in=True, norm_alpha_in=alpha, norm_beta_in=beta, 
             add_norm_out=True, norm_alpha_out=gamma, norm_beta_out=delta)
 
     srun(['./test_4.x'])
 
-    model = fromfile(fname_2)
+    network = fromfile(fname_2)
 
-    f = FortranFile('test_4_out.bin', 'r')
-    x = f.read_reals(fortran_float).reshape(Ne, Nx)
-    y1 = f.read_reals(fortran_float).reshape(Ne, Ny)
-    dp = f.read_reals(fortran_float)
-    dx = f.read_reals(fortran_float).reshape(Ne, Nx)
-    dy1 = f.read_reals(fortran_float).reshape(Ne, Ny)
-    y2 = np.zeros((Ne, Ny))
-    dy2 = np.zeros((Ne, Ny))
-    f.close()
+    records = read_fortran_records('test_4_out.bin', fortran_float)
+    x = records[0].reshape(Ne, Nx)
+    y1 = records[1].reshape(Ne, Ny)
+    dp = network.fortran_to_numpy_parameters(records[2])
+    dx = records[3].reshape(Ne, Nx)
+    dy1 = records[4].reshape(Ne, Ny)
 
-    for i in range(Ne):
-        y2[i] = model.apply_linearise(x[i])
-        dy2[i] = model.apply_tangent_linear(dp, dx[i])
+    y2 = network.apply_linearise(x)
+    dy2 = network.apply_tangent_linear(dp, dx)
 
     return max(abs(2*(y1-y2)/(y1+y2)).max(), abs(2*(dy1-dy2)/(dy1+dy2)).max())
 
@@ -70,7 +73,9 @@ def multi_test(Ne, Nt):
     def print_float_line(key, value_a):
         print(f'{key:>{KEYSIZE}} {value_a:{VALUESIZE}.{PRECISION}f}')
 
-    error = np.array([unit_test(Ne) for _ in trange(Nt, desc='running unit tests')])
+    model = construct_model(5, 6, 4)
+    error = np.array([unit_test(model, Ne)
+        for _ in trange(Nt, desc='running unit tests', mininterval=0.5, disable=None)])
     print('-'*100)
     print('test #4')
     print('validation of the tangent linear of the fortran module')
@@ -1,46 +1,61 @@
 
 program main
 
+    use iso_fortran_env, only: output_unit
     use fnn_common
     use fnn_network_sequential
 
     implicit none
-    integer(ik) :: Nx, Ny, Ne, i, Np
+    integer(ik) :: Nx, Ny, Ne, i, Np, status
     type(SequentialNeuralNetwork) :: network
+    character(len=4096) :: workdir
 
     real(rk), allocatable :: x(:, :), y(:, :), dy(:, :), dp(:, :), dx(:, :)
 
     Ne = 100
-    network = snn_fromfile(Ne, 'test_5_model.txt')
-    Nx = network % get_input_size()
-    Ny = network % get_output_size()
-    Np = network % get_num_parameters()
-
-    allocate(x(Nx, Ne))
-    allocate(y(Ny, Ne))
-    allocate(dp(Np, Ne))
-    allocate(dx(Nx, Ne))
-    allocate(dy(Ny, Ne))
-
-    call rand2d(x)
-    call rand2d(dy)
-    
-    do i = 1, Ne
-        call network % apply_forward(.true., i, x(:, i), y(:, i))
-    end do
 
-    do i = 1, Ne
-        call network % apply_adjoint(i, dy(:, i), dp(:, i), dx(:, i))
+    ! the program is kept alive between tests: each line of the standard
+    ! input is the directory of a test, and the program answers with a line
+    ! once the outputs of the test have been written
+    do
+        read(*, '(a)', iostat=status) workdir
+        if ( status /= 0 ) exit
+
+        network = snn_fromfile(Ne, trim(workdir)//'/test_5_model.txt')
+        Nx = network % get_input_size()
+        Ny = network % get_output_size()
+        Np = network % get_num_parameters()
+
+        allocate(x(Nx, Ne))
+        allocate(y(Ny, Ne))
+        allocate(dp(Np, Ne))
+        allocate(dx(Nx, Ne))
+        allocate(dy(Ny, Ne))
+
+        call rand2d(x)
+        call rand2d(dy)
+
+        do i = 1, Ne
+            call network % apply_forward(.true., i, x(:, i), y(:, i))
+        end do
+
+        do i = 1, Ne
+            call network % apply_adjoint(i, dy(:, i), dp(:, i), dx(:, i))
+        end do
+
+        open(unit=1, file=trim(workdir)//'/test_5_out.bin', form='unformatted')
+        write(1) x
+        write(1) y
+        write(1) dy
+        write(1) dp
+        write(1) dx
+        close(1)
+
+        deallocate(x, y, dp, dx, dy)
+
+        write(*, '(a)') 'done'
+        flush(output_unit)
     end do
 
-
-    open(unit=1, file='test_5_out.bin', form='unformatted')
-    write(1) x
-    write(1) y
-    write(1) dy
-    write(1) dp
-    write(1) dx
-    close(1)
-
 end program main
 
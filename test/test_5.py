@@ -1,67 +1,89 @@
 
+import os
+import atexit
 import numpy as np
 import tensorflow as tf
-from keras_to_fnn import keras_file_to_txt
-from subprocess import run as srun
-from pyfnn import fromfile
-from scipy.io import FortranFile
-from tqdm import trange
+from keras_to_fnn import keras_to_txt
+from subprocess import Popen, PIPE
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+from pyfnn import fromfile, read_fortran_records
+from tqdm import tqdm
 
 # set double precision in tensorflow
 tf.keras.backend.set_floatx('float64')
 
+# the tests run concurrently, one per process
+tf.config.threading.set_intra_op_parallelism_threads(1)
+tf.config.threading.set_inter_op_parallelism_threads(1)
+
 # use double format in fortan
 fortran_float = 'f8'
 
-def unit_test(Ne):
+def start_fortran():
+    # the fortran program is started once per process and kept alive:
+    # it runs the test in each directory written to its standard input,
+    # and is stopped when the process exits (i.e. when the pool shuts down)
+    global fortran
+    fortran = Popen([os.path.abspath('test_5.x')], stdin=PIPE, stdout=PIPE, text=True)
+    atexit.register(stop_fortran)
+
+def stop_fortran():
+    fortran.terminate()
+    fortran.wait()
+
+def run_fortran(workdir):
+    fortran.stdin.write(workdir+'\n')
+    fortran.stdin.flush()
+    reply = fortran.stdout.readline()
+    if reply.strip() != 'done':
+        # an empty reply means that the program has stopped
+        if not reply:
+            fortran.wait()
+        raise RuntimeError(f'test_5.x failed in {workdir} (reply {reply.strip()!r}, '
+                f'return code {fortran.returncode})')
+
+def unit_test(Ne, seed):
 
     Nx = 5
     Ni = 6
     Ny = 4
 
-    alpha = np.random.randn(Nx)
-    beta = np.random.randn(Nx)
-    gamma = np.random.randn(Ny)
-    delta = np.random.randn(Ny)
+    tf.keras.utils.set_random_seed(int(seed))
+    rng = np.random.default_rng(seed)
+    (alpha, beta) = rng.standard_normal((2, Nx))
+    (gamma, delta) = rng.standard_normal((2, Ny))
 
     model = tf.keras.Sequential()
     model.add(tf.keras.Input(shape=(Nx,)))
     model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='relu'))
     model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='tanh'))
     model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
-    model.compile(loss='mse')
 
-    fname_1 = 'test_5_model.h5'
-    fname_2 = 'test_5_model.txt'
-    model.save(fname_1)
-    del model
-    keras_file_to_txt(fname_2, fname_1, add_norm_in=True, norm_alpha_in=alpha, norm_beta_in=beta, 
-            add_norm_out=True, norm_alpha_out=gamma, norm_beta_out=delta)
+    with TemporaryDirectory() as workdir:
+        fname_2 = os.path.join(workdir, 'test_5_model.txt')
+        keras_to_txt(fname_2, model, add_norm_in=True, norm_alpha_in=alpha, norm_beta_in=beta, 
+                add_norm_out=True, norm_alpha_out=gamma, norm_beta_out=delta)
 
-    srun(['./test_5.x'])
+        run_fortran(workdir)
 
-    model = fromfile(fname_2)
-    Np = model.num_parameters
+        model = fromfile(fname_2)
+        Np = model.num_parameters
 
-    f = FortranFile('test_5_out.bin', 'r')
-    x = f.read_reals(fortran_float).reshape(Ne, Nx)
-    y1 = f.read_reals(fortran_float).reshape(Ne, Ny)
-    dy = f.read_reals(fortran_float).reshape(Ne, Ny)
-    dp1 = f.read_reals(fortran_float).reshape(Ne, Np)
-    dx1 = f.read_reals(fortran_float).reshape(Ne, Nx)
-    f.close()
+        records = read_fortran_records(os.path.join(workdir, 'test_5_out.bin'), fortran_float)
+        x = records[0].reshape(Ne, Nx)
+        y1 = records[1].reshape(Ne, Ny)
+        dy = records[2].reshape(Ne, Ny)
+        dp1 = records[3].reshape(Ne, Np)
+        dx1 = records[4].reshape(Ne, Nx)
 
-    y2 = np.zeros((Ne, Ny))
-    dp2 = np.zeros((Ne, Np))
-    dx2 = np.zeros((Ne, Nx))
+        dp1 = model.fortran_to_numpy_parameters(dp1)
 
-    for i in range(Ne):
-        y2[i] = model.apply_linearise(x[i])
-        (dp, dx) = model.apply_adjoint(dy[i])
-        dp2[i] = dp
-        dx2[i] = dx
+        y2 = model.apply_linearise(x)
+        (dp2, dx2) = model.apply_adjoint(dy)
 
-    return max(abs(2*(y1-y2)/(y1+y2)).max(), abs(2*(dp1-dp2)/(dp1+dp2)).max(), abs(2*(dx1-dx2)/(dx1+dx2)).max())
+        return max(abs(2*(y1-y2)/(y1+y2)).max(), abs(2*(dp1-dp2)/(dp1+dp2)).max(), abs(2*(dx1-dx2)/(dx1+dx2)).max())
 
 KEYSIZE = 10
 VALUESIZE = 25
@@ -75,7 +97,11 @@ def multi_test(Ne, Nt):
     def print_float_line(key, value_a):
         print(f'{key:>{KEYSIZE}} {value_a:{VALUESIZE}.{PRECISION}f}')
 
-    error = np.array([unit_test(Ne) for _ in trange(Nt, desc='running unit tests')])
+    with ProcessPoolExecutor(min(os.cpu_count(), Nt), mp_context=get_context('spawn'),
+            initializer=start_fortran) as executor:
+        futures = [executor.submit(unit_test, Ne, seed) for seed in np.random.randint(2**31, size=Nt)]
+        error = np.array([future.result()
+            for future in tqdm(futures, desc='running unit tests', mininterval=0.5, disable=None)])
     print('-'*100)
     print('test #5')
     print('validation of the adjoint of the fortran module')
@@ -90,5 +116,6 @@ def multi_test(Ne, Nt):
     print_float_line('std', np.log10(error.std()))
     print('-'*100)
 
-multi_test(100, 10)
+if __name__ == '__main__':
+    multi_test(100, 10)
 
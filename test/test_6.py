@@ -1,60 +1,61 @@
 
+import os
 import numpy as np
 import tensorflow as tf
-from keras_to_fnn import keras_file_to_txt
+from keras_to_fnn import keras_to_txt
 from subprocess import run as srun
-from pyfnn import fromfile
-from scipy.io import FortranFile
-from tqdm import trange
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+from pyfnn import fromfile, read_fortran_records
+from tqdm import tqdm
 
 # set double precision in tensorflow
 tf.keras.backend.set_floatx('float64')
 
+# the tests run concurrently, one per process
+tf.config.threading.set_intra_op_parallelism_threads(1)
+tf.config.threading.set_inter_op_parallelism_threads(1)
+
 # use double format in fortan
 fortran_float = 'f8'
 
-def unit_test(Ne):
+def unit_test(Ne, seed):
 
     Nx = 5
     Ni = 6
     Ny = 4
 
-    alpha = np.random.randn(Nx)
-    beta = np.random.randn(Nx)
-    gamma = np.random.randn(Ny)
-    delta = np.random.randn(Ny)
+    tf.keras.utils.set_random_seed(int(seed))
+    rng = np.random.default_rng(seed)
+    (alpha, beta) = rng.standard_normal((2, Nx))
+    (gamma, delta) = rng.standard_normal((2, Ny))
 
     model = tf.keras.Sequential()
     model.add(tf.keras.Input(shape=(Nx,)))
     model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='relu'))
     model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='tanh'))
     model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
-    model.compile(loss='mse')
 
-    fname_1 = 'test_6_model.h5'
-    fname_2 = 'test_6_model.txt'
-    model.save(fname_1)
-    del model
-    keras_file_to_txt(fname_2, fname_1, add_norm_in=True, norm_alpha_in=alpha, norm_beta_in=beta, 
-            add_norm_out=True, norm_alpha_out=gamma, norm_beta_out=delta)
+    with TemporaryDirectory() as workdir:
+        fname_2 = os.path.join(workdir, 'test_6_model.txt')
+        keras_to_txt(fname_2, model, add_norm_in=True, norm_alpha_in=alpha, norm_beta_in=beta, 
+                add_norm_out=True, norm_alpha_out=gamma, norm_beta_out=delta)
 
-    srun(['./test_6.x'])
+        srun([os.path.abspath('test_6.x')], cwd=workdir)
 
-    model = fromfile(fname_2)
+        model = fromfile(fname_2)
 
-    f = FortranFile('test_6_out.bin', 'r')
-    p = f.read_reals(fortran_float)
-    x = f.read_reals(fortran_float).reshape(Ne, Nx)
-    y1 = f.read_reals(fortran_float).reshape(Ne, Ny)
-    y2 = np.zeros((Ne, Ny))
-    f.close()
+        records = read_fortran_records(os.path.join(workdir, 'test_6_out.bin'), fortran_float)
+        p = records[0]
+        x = records[1].reshape(Ne, Nx)
+        y1 = records[2].reshape(Ne, Ny)
 
-    model.parameters = p
+        model.parameters = model.fortran_to_numpy_parameters(p)
 
-    for i in range(Ne):
-        y2[i] = model.apply(x[i])
+        y2 = model.apply(x)
 
-    return abs(2*(y1-y2)/(y1+y2)).max()
+        return abs(2*(y1-y2)/(y1+y2)).max()
 
 KEYSIZE = 10
 VALUESIZE = 25
@@ -68,7 +69,10 @@ def multi_test(Ne, Nt):
     def print_float_line(key, value_a):
         print(f'{key:>{KEYSIZE}} {value_a:{VALUESIZE}.{PRECISION}f}')
 
-    error = np.array([unit_test(Ne) for _ in trange(Nt, desc='running unit tests')])
+    with ProcessPoolExecutor(min(os.cpu_count(), Nt), mp_context=get_context('spawn')) as executor:
+        futures = [executor.submit(unit_test, Ne, seed) for seed in np.random.randint(2**31, size=Nt)]
+        error = np.array([future.result()
+            for future in tqdm(futures, desc='running unit tests', mininterval=0.5, disable=None)])
     print('-'*100)
     print('test #6')
     print('validation of parameter replacement in the fortran module')
@@ -83,5 +87,6 @@ def multi_test(Ne, Nt):
     print_float_line('std', error.std())
     print('-'*100)
 
-multi_test(100, 10)
+if __name__ == '__main__':
+    multi_test(100, 10)
 
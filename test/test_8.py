@@ -24,11 +24,11 @@ def unit_test(Ne):
     model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='relu'))
     model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', activation='tanh'))
     model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
-    model.compile(loss='mse')
 
     x = np.random.randn(Ne, Nx)
     xn = alpha * x + beta
-    y1 = gamma * model.predict(xn) + delta
+    # the model is new in each test, hence it is called directly rather than compiled
+    y1 = gamma * model(xn, training=False).numpy() + delta
 
     fname_1 = 'test_8_model.h5'
     fname_2 = 'test_8_model.txt'
@@ -39,9 +39,7 @@ def unit_test(Ne):
             add_norm_out=True, norm_alpha_out=gamma, norm_beta_out=delta, dropout_rates=[0.5, 0.5])
 
     model = fromfile(fname_2)
-    y2 = np.zeros((Ne, Ny))
-    for i in range(Ne):
-        y2[i] = model.apply(x[i])
+    y2 = model.apply(x)
 
     return abs(2*(y1-y2)/(y1+y2)).max()
 
@@ -57,7 +55,7 @@ def multi_test(Ne, Nt):
     def print_float_line(key, value_a):
         print(f'{key:>{KEYSIZE}} {value_a:{VALUESIZE}.{PRECISION}f}')
 
-    error = np.array([unit_test(Ne) for _ in trange(Nt, desc='running unit tests')])
+    error = np.array([unit_test(Ne) for _ in trange(Nt, desc='running unit tests', mininterval=0.5, disable=None)])
     print('-'*100)
     print('test #8')
     print('validation of forward and read of the python toolkit')
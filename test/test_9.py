@@ -1,45 +1,47 @@
 
+import os
 import numpy as np
 import tensorflow as tf
-from keras_to_fnn import keras_file_to_txt
+from keras_to_fnn import keras_to_txt
 from subprocess import run as srun
-from pyfnn import fromfile
-from scipy.io import FortranFile
-from tqdm import trange
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+from pyfnn import fromfile, read_fortran_records
+from tqdm import tqdm
 
 # set double precision in tensorflow
 tf.keras.backend.set_floatx('float64')
 
+# the tests run concurrently, one per process
+tf.config.threading.set_intra_op_parallelism_threads(1)
+tf.config.threading.set_inter_op_parallelism_threads(1)
+
 # use double format in fortan
 fortran_float = 'f8'
 
-def unit_test(list_rates, Nt):
+def test_one(rate, seed):
+
+    Nx = 5
+    Ni = 6
+    Ny = 4
+
+    tf.keras.utils.set_random_seed(int(seed))
+    rng = np.random.default_rng(seed)
+    (alpha, beta) = rng.standard_normal((2, Nx))
+    (gamma, delta) = rng.standard_normal((2, Ny))
 
-    def test_one(rate):
-
-        Nx = 5
-        Ni = 6
-        Ny = 4
-
-        alpha = np.random.randn(Nx)
-        beta = np.random.randn(Nx)
-        gamma = np.random.randn(Ny)
-        delta = np.random.randn(Ny)
-
-        model = tf.keras.Sequential()
-        model.add(tf.keras.Input(shape=(Nx,)))
-        model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', 
-            activation='relu'))
-        model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', 
-            activation='tanh'))
-        model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
-        model.compile(loss='mse')
-
-        fname_1 = 'test_9_model.h5'
-        fname_2 = 'test_9_model.txt'
-        model.save(fname_1)
-        del model
-        keras_file_to_txt(fname_2, fname_1, 
+    model = tf.keras.Sequential()
+    model.add(tf.keras.Input(shape=(Nx,)))
+    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', 
+        activation='relu'))
+    model.add(tf.keras.layers.Dense(Ni, bias_initializer='glorot_uniform', 
+        activation='tanh'))
+    model.add(tf.keras.layers.Dense(Ny, bias_initializer='glorot_uniform'))
+
+    with TemporaryDirectory() as workdir:
+        fname_2 = os.path.join(workdir, 'test_9_model.txt')
+        keras_to_txt(fname_2, model, 
                 add_norm_in=True, 
                 norm_alpha_in=alpha, 
                 norm_beta_in=beta, 
@@ -48,27 +50,33 @@ def unit_test(list_rates, Nt):
                 norm_beta_out=delta, 
                 dropout_rates=[rate, rate])
 
-        srun(['./test_9.x'])
+        srun([os.path.abspath('test_9.x')], cwd=workdir)
 
         model = fromfile(fname_2)
 
         Ne = 100
-        f = FortranFile('test_9_out.bin', 'r')
-        x = f.read_reals(fortran_float).reshape((Ne, Nx))
-        y1 = f.read_reals(fortran_float).reshape((Ne, Ny))
-        y2 = np.zeros((Ne, Ny))
-        f.close()
+        records = read_fortran_records(os.path.join(workdir, 'test_9_out.bin'), fortran_float)
+        x = records[0].reshape((Ne, Nx))
+        y1 = records[1].reshape((Ne, Ny))
+
+        # this model ignores dropout
+        y2 = model.apply(x)
 
-        for i in range(Ne):
-            # this model ignores dropout
-            y2[i] = model.apply(x[i])
+        # relative rms error, the sum of squares is a single dot product
+        r = y1 - y2
+        r /= y1 + y2
+        return 2*np.sqrt(np.vdot(r, r)/r.size)
 
-        return np.sqrt(np.mean(np.square(2*(y1-y2)/(y1+y2))))
+def unit_test(list_rates, Nt):
 
-    error = np.zeros((len(list_rates), Nt))
-    for (j, rate) in enumerate(list_rates):
-        for t in trange(Nt, desc=f'testing rate {rate}'):
-            error[j, t] = test_one(rate)
+    with ProcessPoolExecutor(os.cpu_count(), mp_context=get_context('spawn')) as executor:
+        seeds = np.random.randint(2**31, size=(len(list_rates), Nt))
+        futures = [[executor.submit(test_one, rate, seed) for seed in seeds_j]
+            for (rate, seeds_j) in zip(list_rates, seeds)]
+        error = np.zeros((len(list_rates), Nt))
+        for (j, rate) in enumerate(list_rates):
+            error[j] = [future.result()
+                for future in tqdm(futures[j], desc=f'testing rate {rate}', mininterval=0.5, disable=None)]
 
     return error
 
@@ -98,5 +106,6 @@ def multi_test(Nt):
         print_float_line(rate, error[i].mean(), error[i].std())
     print('-'*100)
 
-multi_test(100)
+if __name__ == '__main__':
+    multi_test(100)
 